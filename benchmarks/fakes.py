@@ -0,0 +1,233 @@
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from pipeline.packing import CHUNK_SEPARATOR
+from pipeline.structural_graph import foreign_key_targets, index_tables, table_to_graph_document
+from prompts.db_to_graphs_compact_v0 import COMPACT_GRAPH_TOOL
+from pipeline.tokens import estimate_tokens
+
+
+def prompt_kind(prompt):
+    # Which pipeline stage a prompt comes from, counters are kept per stage.
+    if "concise, descriptive story" in prompt:
+        return "augmentation"
+    if "infer its foreign keys" in prompt:
+        return "semantics"
+    return "extraction"
+
+
+class CannedResponder:
+    # Builds plausible answers for every prompt of the pipeline from the parsed schema, so the rest of
+    # the pipeline gets real work to do.
+    def __init__(self, tables):
+        self.tables_by_name = index_tables(tables)
+
+    def find_table(self, prompt, marker):
+        text = prompt.split(marker)[-1]
+        match = re.search(r"(?:CREATE TABLE|The table)\s+([\w.$\"`]+)", text)
+        return self.tables_by_name.get(match.group(1).strip("\"`").lower()) if match else None
+
+    def find_tables(self, prompt, marker):
+        text = prompt.split(marker)[-1]
+        chunks = text.split(CHUNK_SEPARATOR) if CHUNK_SEPARATOR in text else [text]
+        return [table for table in (self.find_table(chunk, marker) for chunk in chunks) if table is not None]
+
+    def compact_table(self, table):
+        primary_key = {name.lower() for name in table.primary_key}
+        foreign_keys = foreign_key_targets(table, self.tables_by_name, {})
+        return {
+            "table": table.name,
+            "description": f"Stores {table.name} records.",
+            "columns": [
+                [
+                    column.name, column.data_type,
+                    ("P" if column.name.lower() in primary_key else "") + ("N" if column.is_nullable else ""),
+                    foreign_keys.get(column.name, ""), f"The {column.name} of the {table.name}.",
+                ]
+                for column in table.columns
+            ],
+        }
+
+    def __call__(self, prompt, tool_name=None):
+        kind = prompt_kind(prompt)
+        if kind == "augmentation":
+            table = self.find_table(prompt, "### Task")
+            columns = ", ".join(f"{column.name} ({column.data_type})" for column in table.columns)
+            return f"The table {table.name} stores {table.name} records. It has the columns {columns}."
+        if kind == "semantics":
+            table = self.find_table(prompt, "Describe the following table:")
+            return json.dumps({
+                "table_description": f"Stores {table.name} records.",
+                "column_descriptions": {column.name: f"The {column.name} of the {table.name}." for column in table.columns},
+                "foreign_keys": {},
+            })
+
+        if tool_name == COMPACT_GRAPH_TOOL["function"]["name"]:
+            return {"tables": [self.compact_table(table) for table in self.find_tables(prompt, "### Input Chunk")]}
+
+        # A packed input has one chunk per table, the answer has the nodes of all of them.
+        graph_documents = [
+            table_to_graph_document(table, self.tables_by_name) for table in self.find_tables(prompt, "### Input Chunk")
+        ]
+        arguments = {
+            "nodes": [
+                {
+                    "id": node.id,
+                    "type": node.type,
+                    "properties": [{"key": key, "value": str(value)} for key, value in node.properties.items()],
+                }
+                for graph_document in graph_documents for node in graph_document.nodes
+            ],
+            "relationships": [
+                {
+                    "source_node_id": relationship.source.id, "source_node_type": relationship.source.type,
+                    "target_node_id": relationship.target.id, "target_node_type": relationship.target.type,
+                    "type": relationship.type,
+                }
+                for graph_document in graph_documents for relationship in graph_document.relationships
+            ],
+        }
+        return arguments if tool_name else json.dumps(arguments)
+
+
+class FakeChatModel(BaseChatModel):
+    # Chat model stand-in: sleeps for `latency` seconds per call, answers with `responder` and counts
+    # calls and tokens per pipeline stage.
+    responder: object
+    latency: float = 0.0
+    model_name: str = "gpt-4o"
+    counters: dict = None
+    lock: object = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.counters = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        self.lock = threading.Lock()
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def respond(self, messages, tools=None, **kwargs):
+        prompt = "\n".join(str(message.content) for message in messages)
+        tool_name = tools[0]["function"]["name"] if tools else None
+        response = self.responder(prompt, tool_name)
+        if tool_name:
+            content = json.dumps(response)
+            message = AIMessage(content="", tool_calls=[{"name": tool_name, "args": response, "id": str(uuid.uuid4())}])
+        else:
+            content = response
+            message = AIMessage(content=content)
+
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        with self.lock:
+            counter = self.counters[prompt_kind(prompt)]
+            counter["calls"] += 1
+            counter["prompt_tokens"] += prompt_tokens
+            counter["completion_tokens"] += completion_tokens
+        token_usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": token_usage, "model_name": self.model_name},
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self.respond(messages, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.respond(messages, **kwargs)
+
+
+class InMemoryGraphStore:
+    # Stand-in for both Neo4jGraph and Neo4jBulkWriter, keeps the graph in dicts.
+    def __init__(self, write_latency=0.0):
+        self.write_latency = write_latency
+        self.nodes = {}
+        self.relationships = {}
+        self.documents = {}
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        self.schema = ""
+        self.structured_schema = {}
+
+    # Neo4jGraph interface
+    def add_graph_documents(self, graph_documents, include_source=False, baseEntityLabel=False):
+        started_at = time.perf_counter()
+        time.sleep(self.write_latency)
+        for graph_document in graph_documents:
+            for node in graph_document.nodes:
+                self.nodes.setdefault((node.type, node.id), {}).update(node.properties)
+            for relationship in graph_document.relationships:
+                key = (relationship.source.type, relationship.source.id, relationship.type,
+                       relationship.target.type, relationship.target.id)
+                self.relationships[key] = dict(relationship.properties)
+            if include_source and graph_document.source is not None:
+                self.documents[graph_document.source.page_content] = graph_document.source.metadata
+            self.rows_written += len(graph_document.nodes) + len(graph_document.relationships)
+        self.write_seconds += time.perf_counter() - started_at
+
+    def query(self, query, params=None):
+        return []
+
+    def refresh_schema(self):
+        pass
+
+    @property
+    def get_schema(self):
+        return self.schema
+
+    # Neo4jBulkWriter interface
+    def setup(self, labels=("TABLE", "COLUMN")):
+        pass
+
+    def write(self, graph_documents):
+        self.add_graph_documents(graph_documents, include_source=True)
+
+    def flush(self):
+        pass
+
+    def replace_table(self, table_name, graph_documents, stale_nodes=(), stale_relationships=()):
+        for relationship in stale_relationships:
+            self.relationships.pop(tuple(relationship), None)
+        for node in stale_nodes:
+            node = tuple(node)
+            self.nodes.pop(node, None)
+            self.relationships = {
+                key: value for key, value in self.relationships.items()
+                if (key[0], key[1]) != node and (key[3], key[4]) != node
+            }
+        self.write(graph_documents)
+
+    def delete_table(self, table_name, nodes):
+        self.replace_table(table_name, [], stale_nodes=nodes)
+
+    @property
+    def rows_per_second(self):
+        return self.rows_written / self.write_seconds if self.write_seconds else 0.0
+
+    def report(self):
+        print(f"In-memory graph: {len(self.nodes)} nodes, {len(self.relationships)} relationships")
+
+    def close(self):
+        pass
@@ -0,0 +1,103 @@
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import CannedResponder, FakeChatModel, InMemoryGraphStore
+from benchmarks.synthetic_schemas import synthetic_schema
+from graph_builder import DBToGraph
+from pipeline.ddl_parser import parse_schema
+from pipeline.rate_limiter import RequestScheduler
+from schemas.mondial_schema import MONDIAL_SCHEMA
+
+
+def llm_totals(llm):
+    return {
+        key: sum(counter[key] for counter in llm.counters.values())
+        for key in ("calls", "prompt_tokens", "completion_tokens")
+    }
+
+
+def measure(stage, function, llm, store, results):
+    llm_before, write_before = llm_totals(llm), store.write_seconds
+    tracemalloc.reset_peak()
+    started_at = time.perf_counter()
+    output = function()
+    seconds = time.perf_counter() - started_at
+    llm_after = llm_totals(llm)
+    results.append({
+        "stage": stage,
+        "seconds": round(seconds, 3),
+        **{key: llm_after[key] - llm_before[key] for key in llm_after},
+        "write_seconds": round(store.write_seconds - write_before, 3),
+        "peak_memory_mb": round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1),
+    })
+    return output
+
+
+def run_benchmark(schema_name, schema, latency=0.05, max_concurrency=16, extraction_mode="llm", pack_max_tokens=None):
+    # Cold build against the local stand-ins: empty caches, fake LLM, in-memory graph.
+    tables = parse_schema(schema)
+    llm = FakeChatModel(responder=CannedResponder(tables), latency=latency)
+    store = InMemoryGraphStore()
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        tracemalloc.start()
+        try:
+            db_to_graph = DBToGraph(
+                schema, max_concurrency=max_concurrency, extraction_mode=extraction_mode, cache_dir=cache_dir,
+                llm=llm, writer=store, pack_max_tokens=pack_max_tokens,
+                # The fake model has no rate limits, only its latency should bound the run.
+                scheduler=RequestScheduler(requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12),
+            )
+            # The chunks are augmented on first access, structural builds describe the tables while extracting.
+            if extraction_mode != "structural":
+                measure("augment", lambda: db_to_graph.augmented_schema_chunks, llm, store, results)
+            measure("extract+write", db_to_graph.create_kg, llm, store, results)
+        finally:
+            tracemalloc.stop()
+    for result in results:
+        result.update(schema=schema_name, tables=len(tables), mode=extraction_mode)
+    return results
+
+
+def print_results(results):
+    columns = ["schema", "tables", "mode", "stage", "seconds", "calls", "prompt_tokens", "completion_tokens",
+               "write_seconds", "peak_memory_mb"]
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline DBToGraph benchmark with a fake LLM and an in-memory graph.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 1000, 10000], help="Synthetic schema sizes.")
+    parser.add_argument("--no-mondial", action="store_true", help="Skip the Mondial schema.")
+    parser.add_argument("--modes", nargs="*", default=["llm", "compact", "structural"], help="Extraction modes to run.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency per call, in seconds.")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--pack-max-tokens", type=int, help="Pack small tables into extraction calls up to this budget.")
+    parser.add_argument("--output", help="Append the results to this JSONL file.")
+    args = parser.parse_args()
+
+    schemas = [] if args.no_mondial else [("mondial", MONDIAL_SCHEMA)]
+    schemas += [(f"synthetic_{size}", synthetic_schema(size)) for size in args.sizes]
+
+    results = []
+    for schema_name, schema in schemas:
+        for mode in args.modes:
+            results += run_benchmark(
+                schema_name, schema, args.latency, args.max_concurrency, mode, args.pack_max_tokens
+            )
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "a") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import random
+
+DATA_TYPES = ["INT", "BIGINT", "FLOAT", "DATE", "VARCHAR(35)", "VARCHAR(120)", "DECIMAL(10,2)", "BOOLEAN"]
+
+
+def synthetic_schema(tables_count, seed=0):
+    # Mondial-like DDL: narrow and wide tables, composite keys and columns named after earlier tables,
+    # so the parser, the context index and the foreign key inference all have work to do.
+    rng = random.Random(seed)
+    statements = []
+    for index in range(tables_count):
+        table_name = f"table_{index}"
+        columns = [f" {table_name}_id INT NOT NULL"]
+        primary_key = [f"{table_name}_id"]
+
+        for referenced in rng.sample(range(index), min(index, rng.randint(0, 3))):
+            columns.append(f" table_{referenced}_id INT")
+            if rng.random() < 0.2:
+                primary_key.append(f"table_{referenced}_id")
+
+        for column_index in range(rng.choice([2, 3, 5, 8, 20])):
+            constraint = rng.choice(["", "", " NOT NULL", " UNIQUE"])
+            columns.append(f" attribute_{column_index} {rng.choice(DATA_TYPES)}{constraint}")
+
+        columns.append(f" CONSTRAINT {table_name}_key PRIMARY KEY ({', '.join(primary_key)})")
+        if rng.random() < 0.3:
+            columns.append(f" CONSTRAINT {table_name}_check CHECK (attribute_0 IS NOT NULL)")
+        statements.append(f"CREATE TABLE {table_name}\n(" + ",\n".join(columns) + ");")
+    return "\n\n".join(statements) + "\n"
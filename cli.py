@@ -0,0 +1,146 @@
+import argparse
+import json
+import pathlib
+
+from graph_builder import DEFAULT_CACHE_DIR, DBToGraph
+from schemas.mondial_schema import MONDIAL_SCHEMA
+
+
+def load_schema(args):
+    if args.database_url:
+        # SQLAlchemy is only imported for live databases.
+        from pipeline.introspection import reflect_database
+        return reflect_database(args.database_url, args.db_schemas)
+    # A path is read table by table, the bundled Mondial schema is the default.
+    return pathlib.Path(args.schema) if args.schema else MONDIAL_SCHEMA
+
+
+def create_db_to_graph(args):
+    router = None
+    if args.route:
+        from pipeline.model_router import ModelRouter
+        router = ModelRouter()
+    return DBToGraph(
+        load_schema(args), max_concurrency=args.max_concurrency, extraction_mode=args.mode, cache_dir=args.cache_dir,
+        events_path=args.events_path, streaming=getattr(args, "streaming", False), pack_max_tokens=args.pack_max_tokens,
+        model_name=args.model, router=router,
+    )
+
+
+def print_rows(columns, rows):
+    widths = [max([len(column)] + [len(row[index]) for row in rows]) for index, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def augment(db_to_graph, args):
+    # Fills the augmentation cache, the semantics cache in structural mode.
+    if db_to_graph.extraction_mode == "structural":
+        db_to_graph.describe_tables(db_to_graph.tables)
+    else:
+        db_to_graph.augmented_schema_chunks
+    db_to_graph.telemetry.print_summary()
+
+
+def extract(db_to_graph, args):
+    # Fills the graph document store (validated and repaired), without writing to Neo4j.
+    db_to_graph.build_graph_documents(db_to_graph.tables)
+    db_to_graph.save_quality_report()
+    db_to_graph.telemetry.print_summary()
+
+
+def load(db_to_graph, args):
+    # Builds the graph in Neo4j, only what is missing from the caches calls the LLM.
+    if args.sync:
+        db_to_graph.sync_kg()
+    else:
+        db_to_graph.create_kg()
+
+
+def status(db_to_graph, args):
+    print(f"{len(db_to_graph.tables)} tables, {db_to_graph.extraction_mode} mode, cache in {args.cache_dir}")
+    print_rows(["stage", "cached", "missing"], [
+        [stage, str(entry["cached"]), str(entry["calls"])] for stage, entry in db_to_graph.build_plan().items()
+    ])
+    if db_to_graph.manifest.tables:
+        print("Schema diff since the last build:", db_to_graph.manifest.diff(db_to_graph.tables).summary())
+    else:
+        print("Never built")
+    if db_to_graph.quality_report.tables:
+        print("Quality report:", db_to_graph.quality_report.summary())
+
+
+def dry_run(db_to_graph, args):
+    plan = db_to_graph.build_plan()
+    rows = [
+        [stage, str(entry["calls"]), str(entry["cached"]), str(entry["prompt_tokens"]), str(entry["completion_tokens"]),
+         f"{entry['cost_usd']:.4f}"]
+        for stage, entry in plan.items()
+    ]
+    rows.append([
+        "total", *(str(sum(entry[key] for entry in plan.values())) for key in ("calls", "cached", "prompt_tokens", "completion_tokens")),
+        f"{sum(entry['cost_usd'] for entry in plan.values()):.4f}",
+    ])
+    print(f"Estimated LLM usage with {db_to_graph.cache_model_name}, nothing is called:")
+    print_rows(["stage", "calls", "cached", "prompt_tokens", "completion_tokens", "cost_usd"], rows)
+
+
+def build_many(args):
+    # The tenants file is a JSON list of {"name", "schema" (a DDL file) or "database_url", and optionally
+    # "database", "label_prefix", "id_prefix", "options"}.
+    from pipeline.multi_schema import TenantSchema, build_schemas
+
+    with open(args.tenants) as file:
+        tenants = [
+            TenantSchema(**{**entry, "schema": pathlib.Path(entry["schema"]) if entry.get("schema") else None})
+            for entry in json.load(file)
+        ]
+    common_options = {"extraction_mode": args.mode, "max_concurrency": args.max_concurrency,
+                      "pack_max_tokens": args.pack_max_tokens, "model_name": args.model}
+    for tenant in tenants:
+        tenant.options = {**common_options, **tenant.options}
+    results = build_schemas(tenants, args.cache_dir, args.processes)
+    for result in results:
+        print(json.dumps(result))
+
+
+COMMANDS = {"augment": augment, "extract": extract, "load": load, "status": status, "dry-run": dry_run}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a knowledge graph of a database schema in Neo4j.")
+    parser.add_argument("--schema", help="DDL file, the bundled Mondial schema by default.")
+    parser.add_argument("--database-url", help="Reflect the schema from a live database instead (SQLAlchemy URL).")
+    parser.add_argument("--db-schemas", nargs="*", help="Database schemas to reflect, all of them by default.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--mode", choices=["llm", "compact", "structural"], default="llm", help="Extraction mode.")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--route", action="store_true", help="Route tables between model tiers by complexity.")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--pack-max-tokens", type=int, help="Pack small tables into extraction calls up to this budget.")
+    parser.add_argument("--events-path", help="Append the telemetry events to this JSONL file.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("augment", help="Run the augmentation stage into the cache.")
+    subparsers.add_parser("extract", help="Extract and validate graph documents into the store, without Neo4j.")
+    load_parser = subparsers.add_parser("load", help="Build the graph in Neo4j.")
+    load_parser.add_argument("--sync", action="store_true", help="Only rebuild the tables that changed.")
+    load_parser.add_argument("--streaming", action="store_true", help="Run the stages table by table.")
+    subparsers.add_parser("status", help="Show the cache coverage and what changed since the last build.")
+    subparsers.add_parser("dry-run", help="Estimate the calls, tokens and cost of the next build.")
+    build_schemas_parser = subparsers.add_parser(
+        "build-schemas", help="Build many schemas over a process pool, each in its own cache and namespace."
+    )
+    build_schemas_parser.add_argument("tenants", help="JSON file listing the schemas to build.")
+    build_schemas_parser.add_argument("--processes", type=int, help="Worker processes, one per core by default.")
+    args = parser.parse_args()
+
+    if args.command == "build-schemas":
+        # Each tenant gets a subdirectory of the cache directory.
+        build_many(args)
+    else:
+        COMMANDS[args.command](create_db_to_graph(args), args)
+
+
+if __name__ == "__main__":
+    main()
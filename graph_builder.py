@@ -1,80 +1,779 @@
 import os
-import re
-import requests
-import urllib.parse
+import asyncio
+import time
+from collections import defaultdict
+from functools import cached_property
 from dotenv import load_dotenv
-from langchain_community.graphs import Neo4jGraph
-from langchain_experimental.graph_transformers import LLMGraphTransformer
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.exceptions import OutputParserException
 from langchain_core.documents import Document
-from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from prompts.db_to_graphs_prompt_v1 import DB_GRAPH_PROMPT
-from prompts.table_data_augmentation_v0 import DATA_AUGMENTATION_PROMPT
+from prompts.db_to_graphs_compact_v0 import COMPACT_GRAPH_PROMPT, COMPACT_GRAPH_PROMPT_VERSION, COMPACT_GRAPH_TOOL
+from prompts.db_to_graphs_prompt_v2 import DB_GRAPH_PROMPT, DB_GRAPH_PROMPT_VERSION, format_graph_input
+from prompts.table_data_augmentation_v0 import DATA_AUGMENTATION_PROMPT, DATA_AUGMENTATION_PROMPT_VERSION
+from prompts.graph_repair_v0 import GRAPH_REPAIR_PROMPT
+from prompts.table_semantics_v0 import TABLE_SEMANTICS_PROMPT, TABLE_SEMANTICS_PROMPT_VERSION
+from pipeline.augmentation_cache import AugmentationCache
+from pipeline.compact_graph import decode_compact_graph, format_graph_document
+from pipeline.batch import batch_custom_id, batch_request, read_batch_results, write_jsonl
+from pipeline.graph_store import GraphDocumentStore
+from pipeline.join_index import JoinIndex
+from pipeline.model_router import augmentation_issues, table_complexity
+from pipeline.neo4j_writer import DEFAULT_BATCH_SIZE, Neo4jBulkWriter
+from pipeline.packing import DEFAULT_MAX_TABLES_PER_PACK, join_chunks, pack_chunks, split_pack
+from pipeline.rate_limiter import EXPECTED_COMPLETION_TOKENS, RequestScheduler
+from pipeline.schema_diff import BuildManifest
+from pipeline.telemetry import BuildTelemetry, JSONLEventSink, estimate_cost
+from pipeline.schema_context import DEFAULT_MAX_CONTEXT_TOKENS, SchemaContextIndex
+from pipeline.streaming import iter_tables, run_pipeline
+from pipeline.structural_graph import index_tables, table_to_graph_document
+from pipeline.tokens import estimate_tokens
+from pipeline.validation import (
+    QualityReport, extracted_semantics, repair_graph_document, repair_request, validate_graph_document
+)
 from schemas.mondial_schema import MONDIAL_SCHEMA
 
 load_dotenv()
 
+# Caches, document store and build reports, out of the checked-in schemas/ package and ignored by git.
+DEFAULT_CACHE_DIR = ".db_to_graph_cache"
+
+GRAPH_TRANSFORMER_CONFIG = {
+    "allowed_nodes": ["TABLE", "COLUMN"],
+    "allowed_relationships": ["IS_COLUMN_OF", "FOREIGN_KEY_OF"],
+    "node_properties": [
+        "table_name", "columns", "primary_key", "foreign_keys", "table_description",
+        "column_name", "data_type", "is_nullable", "is_primary_key", "is_foreign_key", "column_description"
+    ],
+}
+
 class DBToGraph:
-    def __init__(self, schema):
+    def __init__(self, schema, max_concurrency=1, extraction_mode="llm", max_context_tokens=DEFAULT_MAX_CONTEXT_TOKENS,
+                 include_source=True, write_batch_size=DEFAULT_BATCH_SIZE, cache_dir=DEFAULT_CACHE_DIR,
+                 llm=None, writer=None, telemetry_hooks=(), events_path=None,
+                 requests_per_minute=None, tokens_per_minute=None, scheduler=None, batch_submitter=None,
+                 streaming=False, embedding_index=None, pack_max_tokens=None, pack_max_tables=DEFAULT_MAX_TABLES_PER_PACK,
+                 model_name="gpt-4o", router=None):
+        # "llm" extracts the whole graph with the LLMGraphTransformer, "compact" asks for the same graph as one
+        # strict function call with a row per column and decodes it locally, "structural" builds tables and columns
+        # from the parsed DDL and only asks the LLM for descriptions and inferred foreign keys.
+        self.extraction_mode = extraction_mode
+
+        # Max number of LLM calls in flight at the same time, 1 keeps everything sequential.
+        self.max_concurrency = max_concurrency
+
+        # Streaming builds run augmentation, extraction and writes table by table through bounded queues, instead of
+        # augmenting every table up front, so the first nodes are written right away and chunks and graph documents
+        # in flight don't grow with the schema. The parsed tables (DDL included), the context index, the manifest
+        # and the telemetry events still do, they are built or kept for the whole schema.
+        self.streaming = streaming
+
+        # llm and writer can be passed in to share them between builds or to use local stand-ins, otherwise
+        # they are created on first use (see the properties below), so commands that don't call the LLM or
+        # Neo4j start without connecting or importing the clients.
+        # With a ModelRouter (see pipeline/model_router.py), augmentation, semantics and extraction calls go to the
+        # cheapest model tier each table's complexity allows, and one tier up when the output fails its structural
+        # checks. The other calls (repairs, batches) use llm, by default the router's last tier.
+        self.router = router
+        self.router_transformers = {}
+        if router is not None and llm is None:
+            model_name = router.model_name(-1)
+        self.model_name = getattr(llm, "model_name", model_name)
+        # Cached outputs depend on the routing too, they are keyed on it instead of the model.
+        self.cache_model_name = router.name if router is not None else self.model_name
+        if llm is not None:
+            self.llm = llm
+        if writer is not None:
+            self.writer = writer
+        self.write_batch_size = write_batch_size
+        self.include_source = include_source
+
+        # Every LLM call of the build goes through the same requests and tokens per minute budget (OPENAI_RPM and
+        # OPENAI_TPM by default), with backoff on 429s and timeouts.
+        self.scheduler = scheduler or RequestScheduler(requests_per_minute, tokens_per_minute)
+
+        # Per table and stage events (latency, tokens, cost, write time), sent to the hooks and to events_path as JSONL.
+        self.telemetry = BuildTelemetry(self.model_name, telemetry_hooks)
+        if events_path:
+            self.telemetry.add_hook(JSONLEventSink(events_path))
+
+        # With a batch submitter (see pipeline/batch.py), the augmentation and semantics calls missing from the caches
+        # go out as one Batch API job per stage instead of real time calls, requests and results are kept in batch_dir.
+        self.batch_submitter = batch_submitter
+        self.batch_dir = os.path.join(cache_dir, "batches")
+
+        # What the last build wrote for each table, sync_kg diffs the schema against it.
+        self.manifest = BuildManifest.load(os.path.join(cache_dir, "build_manifest.json"))
+
+        # Optional EmbeddingIndex (see pipeline/embedding_index.py), table and column descriptions are embedded in
+        # batches after each build, only the ones that changed.
+        self.embedding_index = embedding_index
+
+        # Extracted tables are checked against their DDL (columns, types, primary keys, foreign key targets) and the
+        # failed ones repaired, what was found for each table is kept in the quality report.
+        self.quality_report = QualityReport.load(os.path.join(cache_dir, "quality_report.json"))
+
+        # Compact FK / column graph saved after each build, JoinIndex.load gives join paths without Neo4j.
+        self.join_index_path = os.path.join(cache_dir, "join_index.json")
+
+        # Augmented infos are cached per table, keyed by the table DDL, the prompt version and the model.
+        self.augmentation_cache = AugmentationCache(
+            os.path.join(cache_dir, "augmented_cache"), DATA_AUGMENTATION_PROMPT_VERSION, self.cache_model_name
+        )
+
+        self.semantics_cache = AugmentationCache(
+            os.path.join(cache_dir, "semantics_cache"), TABLE_SEMANTICS_PROMPT_VERSION, self.cache_model_name
+        )
+
+        # Extracted graph documents are stored per chunk, so rebuilding a graph (or a new database) replays
+        # them without LLM calls.
+        self.graph_store = GraphDocumentStore(
+            os.path.join(cache_dir, "graph_store"),
+            COMPACT_GRAPH_PROMPT_VERSION if extraction_mode == "compact" else DB_GRAPH_PROMPT_VERSION,
+            {**GRAPH_TRANSFORMER_CONFIG, "model_name": self.cache_model_name},
+        )
+
+        # With pack_max_tokens, consecutive chunks are extracted together, up to that many chunk tokens and
+        # pack_max_tables tables per call, and the answer is split back per table by node id. Packed builds augment
+        # every table before extracting, even when streaming (see packs_tables).
+        self.pack_max_tokens = pack_max_tokens
+        self.pack_max_tables = pack_max_tables
+
+        # Each extraction prompt gets only the tables its chunk may reference, up to max_context_tokens.
+        # The schema is its text, a path, an open file or an iterable of text pieces, read table by table, or the
+        # tables reflected from a live database (see pipeline/introspection.py).
+        self.tables = list(iter_tables(schema))
+        self.tables_by_name = index_tables(self.tables)
+        self.schema_context = SchemaContextIndex(self.tables, max_context_tokens)
+
+    @cached_property
+    def llm(self):
         # Modify temperature and model_name experimentally if need some improvements.
-        self.llm = ChatOpenAI(temperature=0, model_name="gpt-4o")
+        # The scheduler owns the retries, so the client doesn't retry on its own behind it.
+        if self.router is not None:
+            return self.router.llm(-1)
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(temperature=0, model_name=self.model_name, max_retries=0)
 
+    @cached_property
+    def writer(self):
         # To use the neo4j graph, need to run neo4j.sh script. (for more info see README.md)
-        self.graph = Neo4jGraph(refresh_schema=True)
+        # Nodes and relationships go to Neo4j in batched UNWIND transactions, include_source also stores the chunks.
+        return Neo4jBulkWriter(batch_size=self.write_batch_size, include_source=self.include_source)
+
+    @property
+    def node_labels(self):
+        # The table and column labels the build writes, the transformer (and the compact decoder after it) formats
+        # them as "Table" and "Column".
+        return ("TABLE", "COLUMN") if self.extraction_mode == "structural" else ("Table", "Column")
 
+    @cached_property
+    def llm_transformer(self):
         # Initialize the LLMGraphTransformer with the DB_GRAPH_PROMPT and create KB, after this send for Neo4j.
-        self.llm_transformer = self.initialize_db_graph_transformer()
+        return self.initialize_db_graph_transformer()
 
-        # Augment the table infos with the LLM model and make langchain documents about it.
-        self.augmented_schema_chunks = self.transform_schema_to_langchain_documents(schema)
+    @cached_property
+    def augmented_schema_chunks(self):
+        # Augment the table infos with the LLM model and make langchain documents about it, on the first build
+        # that needs them.
+        return self.transform_schema_to_langchain_documents(self.tables)
 
-    def initialize_db_graph_transformer(self):
+    def initialize_db_graph_transformer(self, llm=None):
+        from langchain_experimental.graph_transformers import LLMGraphTransformer
         return LLMGraphTransformer(
-            llm=self.llm,
-            prompt=DB_GRAPH_PROMPT,
-            allowed_nodes=["TABLE", "COLUMN"],
-            allowed_relationships=["IS_COLUMN_OF", "FOREIGN_KEY_OF"],
-            node_properties=[
-                "table_name", "columns", "primary_key", "foreign_keys", "table_description",
-                "column_name", "data_type", "is_nullable", "is_primary_key", "is_foreign_key", "column_description"
-            ]
+            llm=llm or self.llm,
+            prompt=DB_GRAPH_PROMPT.template,
+            **GRAPH_TRANSFORMER_CONFIG
+        )
+
+    def text_chain(self, prompt, llm=None):
+        # Output parsers pull in the tracers, they are imported with the first chain.
+        from langchain_core.output_parsers import StrOutputParser
+        return prompt.template | (llm or self.llm) | StrOutputParser()
+
+    def route(self, table_names, input_text):
+        # The router tier of a call, None without a router. A pack goes to the tier of its most complex table, the
+        # input is shared by its tables.
+        if self.router is None:
+            return None
+        input_tokens = estimate_tokens(input_text) / len(table_names)
+        return max(
+            self.router.route(table_complexity(self.tables_by_name[table_name.lower()], self.schema_context, input_tokens))
+            for table_name in table_names
         )
 
-    def augment_table_infos(self, table_infos):
-        chain = DATA_AUGMENTATION_PROMPT | self.llm | StrOutputParser()
-        return chain.invoke({"input_schema": table_infos})
-
-    def transform_schema_to_langchain_documents(self, schema):
-        langchain_documents = []
-        augmented_infos_path = "schemas/augmented_schema.txt"
-
-        tables = schema.split("CREATE TABLE")
-
-        if not os.path.exists(augmented_infos_path):
-            print("No augmented infos found, creating new chunks...")
-            # write augmented infos to file.
-            with open(augmented_infos_path, "w") as file:
-                for table in tables:
-                    augmented_schema_chunk = self.augment_table_infos(f"CREATE TABLE {table}")
-                    file.write(augmented_schema_chunk)
-                    file.write("\n---new-table-chunk---\n")
-                    langchain_documents.append(Document(page_content=augmented_schema_chunk))
+    def tier_llm(self, tier):
+        return self.llm if tier is None else self.router.llm(tier)
+
+    def tier_model_name(self, tier):
+        return self.model_name if tier is None else self.router.model_name(tier)
+
+    def tier_transformer(self, tier):
+        if tier is None:
+            return self.llm_transformer
+        if tier not in self.router_transformers:
+            self.router_transformers[tier] = self.initialize_db_graph_transformer(self.router.llm(tier))
+        return self.router_transformers[tier]
+
+    def compact_chain(self, tier):
+        # Strict function calling, the answer always parses into the tool's schema.
+        from langchain_core.output_parsers.openai_tools import JsonOutputKeyToolsParser
+        tool_name = COMPACT_GRAPH_TOOL["function"]["name"]
+        llm = self.tier_llm(tier).bind_tools([COMPACT_GRAPH_TOOL], tool_choice=tool_name, strict=True)
+        return COMPACT_GRAPH_PROMPT.template | llm | JsonOutputKeyToolsParser(key_name=tool_name, first_tool_only=True)
+
+    def convert_pack(self, tier, document, chunks, config):
+        # The extraction call of a pack, gives one graph document per chunk.
+        if self.extraction_mode == "compact":
+            output = self.compact_chain(tier).invoke({"input": document.page_content}, config=config)
+            return decode_compact_graph(output, chunks)
+        return split_pack(chunks, self.tier_transformer(tier).convert_to_graph_documents([document], config))
+
+    async def aconvert_pack(self, tier, document, chunks, config):
+        if self.extraction_mode == "compact":
+            output = await self.compact_chain(tier).ainvoke({"input": document.page_content}, config=config)
+            return decode_compact_graph(output, chunks)
+        return split_pack(chunks, await self.tier_transformer(tier).aconvert_to_graph_documents([document], config))
+
+    def output_passes(self, stage, table_name, output):
+        # Structural checks of the routed stages, extraction outputs are the pack's graph documents.
+        if stage == "augmentation":
+            return not augmentation_issues(self.tables_by_name[table_name.lower()], output)
+        if stage == "semantics":
+            return bool(self.parse_semantics(output))
+        return not any(
+            validate_graph_document(
+                self.tables_by_name[graph_document.source.metadata["table_name"].lower()], self.tables_by_name,
+                graph_document,
+            )
+            for graph_document in output
+        )
+
+    def escalate(self, stage, tier, routed_tier, table_name, output, call):
+        # Records a routed call, and gives the tier to call again when its output failed the checks, None to keep it.
+        if tier is None:
+            return None
+        passed = self.output_passes(stage, table_name, output)
+        self.router.record(
+            stage, tier, tier == routed_tier, passed, time.perf_counter() - call.started_at,
+            estimate_cost(self.tier_model_name(tier), call.prompt_tokens, call.completion_tokens),
+        )
+        if passed or not self.router.can_escalate(tier):
+            return None
+        return tier + 1
+
+    async def arun_chain(self, stage, prompt, cache, key, table_name, table_infos, chain_input):
+        estimated_tokens = self.scheduler.estimate(prompt.text(**chain_input), stage)
+        tier = routed_tier = self.route([table_name], "\n".join(chain_input.values()))
+        while True:
+            chain = self.text_chain(prompt, self.tier_llm(tier))
+            with self.telemetry.llm_call(stage, table_name, self.tier_model_name(tier)) as call:
+                output = await self.scheduler.acall(
+                    lambda: chain.ainvoke(chain_input, config=call.config), estimated_tokens, call.on_retry
+                )
+            tier = self.escalate(stage, tier, routed_tier, table_name, output, call)
+            if tier is None:
+                break
+        # Saved as soon as it is ready, a crash later in the run doesn't lose it.
+        cache.put(key, table_infos, output)
+        return output
+
+    async def arun_cached_chain(self, stage, prompt, cache, missing_inputs):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(key, table_name, table_infos, chain_input):
+            async with semaphore:
+                await self.arun_chain(stage, prompt, cache, key, table_name, table_infos, chain_input)
+
+        await asyncio.gather(*(run(key, *inputs) for key, inputs in missing_inputs.items()))
+
+    async def arun_cached_table_chain(self, stage, prompt, cache, table, table_infos, chain_input):
+        # One table version of run_cached_chain, for the streaming build.
+        key = cache.key(table_infos)
+        output = cache.get(key)
+        if output is not None:
+            self.telemetry.cache_hit(stage, table.name)
+            return output
+        return await self.arun_chain(stage, prompt, cache, key, table.name, table_infos, chain_input)
+
+    def missing_chain_inputs(self, stage, prompt, cache, keys, tables, tables_infos, chain_inputs):
+        # The inputs of the tables missing from the cache, after the batch job if there is a batch submitter.
+        missing_inputs = {}
+        for key, table, table_infos, chain_input in zip(keys, tables, tables_infos, chain_inputs):
+            if cache.get(key) is None:
+                missing_inputs[key] = (table.name, table_infos, chain_input)
+            else:
+                self.telemetry.cache_hit(stage, table.name)
+
+        if missing_inputs:
+            print(f"Running {stage} for {len(missing_inputs)} of {len(tables_infos)} tables...")
+        if missing_inputs and self.batch_submitter is not None:
+            missing_inputs = self.run_batch_chain(stage, prompt, cache, missing_inputs)
+        return missing_inputs
+
+    async def arun_cached_tables_chain(self, stage, prompt, cache, tables, tables_infos, chain_inputs):
+        # run_cached_chain on the running event loop.
+        keys = [cache.key(table_infos) for table_infos in tables_infos]
+        missing_inputs = await asyncio.to_thread(
+            self.missing_chain_inputs, stage, prompt, cache, keys, tables, tables_infos, chain_inputs
+        )
+        await self.arun_cached_chain(stage, prompt, cache, missing_inputs)
+        return [cache.get(key) for key in keys]
+
+    def run_cached_chain(self, stage, prompt, cache, tables, tables_infos, chain_inputs):
+        # Runs the chain only for the tables missing from the cache, tables_infos are what the cache is keyed on.
+        keys = [cache.key(table_infos) for table_infos in tables_infos]
+        missing_inputs = self.missing_chain_inputs(stage, prompt, cache, keys, tables, tables_infos, chain_inputs)
+        if self.max_concurrency > 1:
+            asyncio.run(self.arun_cached_chain(stage, prompt, cache, missing_inputs))
         else:
-            with open(augmented_infos_path, "r") as file:
-                augmented_schema_chunk = file.read()
-                chunks = augmented_schema_chunk.split("\n---new-table-chunk---\n")
-                for chunk in chunks:
-                    langchain_documents.append(Document(page_content=chunk))
-        return langchain_documents
+            for key, (table_name, table_infos, chain_input) in missing_inputs.items():
+                cache.put(key, table_infos, self.run_chain(stage, prompt, table_name, chain_input))
+
+        # Read back by key, so the output keeps the tables order whatever order the calls finished in.
+        return [cache.get(key) for key in keys]
+
+    def run_chain(self, stage, prompt, table_name, chain_input):
+        estimated_tokens = self.scheduler.estimate(prompt.text(**chain_input), stage)
+        tier = routed_tier = self.route([table_name], "\n".join(chain_input.values()))
+        while True:
+            chain = self.text_chain(prompt, self.tier_llm(tier))
+            with self.telemetry.llm_call(stage, table_name, self.tier_model_name(tier)) as call:
+                output = self.scheduler.call(
+                    lambda: chain.invoke(chain_input, config=call.config), estimated_tokens, call.on_retry
+                )
+            tier = self.escalate(stage, tier, routed_tier, table_name, output, call)
+            if tier is None:
+                return output
+
+    def run_batch_chain(self, stage, prompt, cache, missing_inputs):
+        # Writes the requests JSONL, runs it through the submitter and ingests the results into the cache.
+        # Returns the tables the batch didn't answer, they go through real time calls.
+        custom_ids = {key: batch_custom_id(stage, table_name, key) for key, (table_name, _, _) in missing_inputs.items()}
+        requests_path = os.path.join(self.batch_dir, f"{stage}_requests.jsonl")
+        write_jsonl(requests_path, [
+            batch_request(custom_ids[key], self.model_name, prompt.template.format_messages(**chain_input))
+            for key, (_, _, chain_input) in missing_inputs.items()
+        ])
+        with self.telemetry.timed(f"{stage}_batch", requests=len(missing_inputs)):
+            results_path = self.batch_submitter.run(requests_path, os.path.join(self.batch_dir, f"{stage}_results.jsonl"))
+        results = read_batch_results(results_path)
+
+        remaining_inputs = {}
+        for key, (table_name, table_infos, chain_input) in missing_inputs.items():
+            if custom_ids[key] not in results:
+                remaining_inputs[key] = (table_name, table_infos, chain_input)
+                continue
+            output, usage = results[custom_ids[key]]
+            cache.put(key, table_infos, output)
+            self.telemetry.batch_result(stage, table_name, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        if remaining_inputs:
+            print(f"{len(remaining_inputs)} {stage} requests failed in the batch, running them in real time...")
+        return remaining_inputs
+
+    def augment_tables_infos(self, tables):
+        tables_infos = [table.ddl for table in tables]
+        chain_inputs = [{"input_schema": table_infos} for table_infos in tables_infos]
+        return self.run_cached_chain("augmentation", DATA_AUGMENTATION_PROMPT, self.augmentation_cache, tables, tables_infos, chain_inputs)
+
+    async def aaugment_tables_infos(self, tables):
+        tables_infos = [table.ddl for table in tables]
+        chain_inputs = [{"input_schema": table_infos} for table_infos in tables_infos]
+        return await self.arun_cached_tables_chain(
+            "augmentation", DATA_AUGMENTATION_PROMPT, self.augmentation_cache, tables, tables_infos, chain_inputs
+        )
+
+    def semantics_inputs(self, table):
+        table_context = self.schema_context.context(table, compact=True)
+        # The known tables are part of the key, the inferred foreign keys depend on them.
+        return f"{table.ddl}\n{table_context}", {"table_infos": table.ddl, "schema_tables": table_context}
+
+    @staticmethod
+    def parse_semantics(output):
+        from langchain_core.output_parsers import JsonOutputParser
+        try:
+            return JsonOutputParser().parse(output)
+        except OutputParserException:
+            # The structure still comes from the DDL, only descriptions and inferred keys are lost.
+            return {}
+
+    def describe_tables(self, tables):
+        inputs = [self.semantics_inputs(table) for table in tables]
+        tables_infos = [table_infos for table_infos, _ in inputs]
+        chain_inputs = [chain_input for _, chain_input in inputs]
+        outputs = self.run_cached_chain("semantics", TABLE_SEMANTICS_PROMPT, self.semantics_cache, tables, tables_infos, chain_inputs)
+        return [self.parse_semantics(output) for output in outputs]
+
+    def transform_schema_to_langchain_documents(self, tables):
+        augmented_schema_chunks = self.augment_tables_infos(tables)
+        return [
+            Document(page_content=chunk, metadata={"table_name": table.name})
+            for chunk, table in zip(augmented_schema_chunks, tables)
+        ]
+
+    async def atransform_schema_to_langchain_documents(self, tables):
+        augmented_schema_chunks = await self.aaugment_tables_infos(tables)
+        return [
+            Document(page_content=chunk, metadata={"table_name": table.name})
+            for chunk, table in zip(augmented_schema_chunks, tables)
+        ]
+
+    def graph_input_document(self, chunks):
+        # A pack of one or more chunks, the related tables are shared by the whole pack.
+        tables = [self.tables_by_name[chunk.metadata["table_name"].lower()] for chunk in chunks]
+        related_tables = self.schema_context.pack_context(tables)
+        return Document(page_content=format_graph_input(join_chunks(chunks), related_tables), metadata=chunks[0].metadata)
+
+    @property
+    def extraction_prompt(self):
+        # The extraction prompt and its expected completion tokens per table.
+        if self.extraction_mode == "compact":
+            return COMPACT_GRAPH_PROMPT, EXPECTED_COMPLETION_TOKENS["compact_extraction"]
+        return DB_GRAPH_PROMPT, EXPECTED_COMPLETION_TOKENS["extraction"]
+
+    def estimate_extraction_tokens(self, document, tables_count):
+        # Every table of a pack adds its nodes to the answer.
+        prompt, completion_tokens = self.extraction_prompt
+        return estimate_tokens(prompt.text(input=document.page_content)) + completion_tokens * tables_count
+
+    @staticmethod
+    def pack_name(chunks):
+        return ", ".join(chunk.metadata["table_name"] for chunk in chunks)
+
+    def stored_graph_documents(self, chunks):
+        # The key is the transformer input, so a change in the related tables extracts the chunk again too.
+        document = self.graph_input_document(chunks)
+        key = self.graph_store.key(document.page_content)
+        graph_documents = self.graph_store.get(key)
+        if graph_documents is not None:
+            self.telemetry.cache_hit("extraction", self.pack_name(chunks))
+        return document, key, graph_documents
+
+    def store_graph_documents(self, key, graph_documents):
+        # One graph document per table (see split_pack), its stored source is the chunk itself, not the prompt
+        # input with the related tables.
+        self.graph_store.put(key, graph_documents)
+
+    def extract_graph_documents(self, chunks):
+        document, key, graph_documents = self.stored_graph_documents(chunks)
+        if graph_documents is None:
+            # A routed pack that fails validation is extracted again one tier up, before any repair.
+            estimated_tokens = self.estimate_extraction_tokens(document, len(chunks))
+            table_names = [chunk.metadata["table_name"] for chunk in chunks]
+            tier = routed_tier = self.route(table_names, document.page_content)
+            while True:
+                with self.telemetry.llm_call("extraction", self.pack_name(chunks), self.tier_model_name(tier)) as call:
+                    graph_documents = self.scheduler.call(
+                        lambda: self.convert_pack(tier, document, chunks, call.config),
+                        estimated_tokens, call.on_retry,
+                    )
+                tier = self.escalate("extraction", tier, routed_tier, None, graph_documents, call)
+                if tier is None:
+                    break
+            self.store_graph_documents(key, graph_documents)
+        return self.repair_graph_documents(key, graph_documents)
+
+    async def aextract_graph_documents(self, chunks):
+        document, key, graph_documents = self.stored_graph_documents(chunks)
+        if graph_documents is None:
+            estimated_tokens = self.estimate_extraction_tokens(document, len(chunks))
+            table_names = [chunk.metadata["table_name"] for chunk in chunks]
+            tier = routed_tier = self.route(table_names, document.page_content)
+            while True:
+                with self.telemetry.llm_call("extraction", self.pack_name(chunks), self.tier_model_name(tier)) as call:
+                    graph_documents = await self.scheduler.acall(
+                        lambda: self.aconvert_pack(tier, document, chunks, call.config),
+                        estimated_tokens, call.on_retry,
+                    )
+                tier = self.escalate("extraction", tier, routed_tier, None, graph_documents, call)
+                if tier is None:
+                    break
+            self.store_graph_documents(key, graph_documents)
+        return await self.arepair_graph_documents(key, graph_documents)
+
+    def check_graph_document(self, graph_document):
+        # Validates an extracted table against its DDL. For a failed one, also gives what the extraction got right
+        # and the repair prompt input, None when the DDL alone fixes it.
+        table = self.tables_by_name[graph_document.source.metadata["table_name"].lower()]
+        issues = validate_graph_document(table, self.tables_by_name, graph_document)
+        if not issues:
+            self.quality_report.record(table.name, issues)
+            return table, issues, None, None
+        semantics = extracted_semantics(table, graph_document)
+        request = repair_request(table, issues, semantics)
+        if request is None:
+            return table, issues, semantics, None
+        return table, issues, semantics, {
+            "table_infos": table.ddl,
+            "schema_tables": self.schema_context.context(table, compact=True),
+            "issues": "\n".join(f"- {issue}" for issue in issues),
+            "repair": request,
+        }
+
+    def repaired_graph_document(self, table, graph_document, issues, semantics, output):
+        repair_semantics = self.parse_semantics(output) if output is not None else None
+        # Rebuilt from the DDL, then formatted like the rest of the extracted graph (Table / Column, "City.Name"),
+        # so foreign keys of other tables still point at its nodes.
+        repaired = format_graph_document(
+            repair_graph_document(table, self.tables_by_name, graph_document, semantics, repair_semantics)
+        )
+        remaining = validate_graph_document(table, self.tables_by_name, repaired)
+        self.quality_report.record(table.name, issues, output is not None, remaining)
+        return repaired
+
+    def repair_graph_documents(self, key, graph_documents):
+        # Failed tables are rebuilt from the DDL, a small prompt asks only for what got lost, and the repaired
+        # documents replace the stored ones so the next build replays them.
+        repaired = False
+        for index, graph_document in enumerate(graph_documents):
+            table, issues, semantics, chain_input = self.check_graph_document(graph_document)
+            if not issues:
+                continue
+            output = None
+            if chain_input is not None:
+                chain = self.text_chain(GRAPH_REPAIR_PROMPT)
+                with self.telemetry.llm_call("repair", table.name) as call:
+                    output = self.scheduler.call(
+                        lambda: chain.invoke(chain_input, config=call.config),
+                        self.scheduler.estimate(GRAPH_REPAIR_PROMPT.text(**chain_input), "repair"), call.on_retry,
+                    )
+            graph_documents[index] = self.repaired_graph_document(table, graph_document, issues, semantics, output)
+            repaired = True
+        if repaired:
+            self.graph_store.put(key, graph_documents)
+        return graph_documents
+
+    async def arepair_graph_documents(self, key, graph_documents):
+        repaired = False
+        for index, graph_document in enumerate(graph_documents):
+            table, issues, semantics, chain_input = self.check_graph_document(graph_document)
+            if not issues:
+                continue
+            output = None
+            if chain_input is not None:
+                chain = self.text_chain(GRAPH_REPAIR_PROMPT)
+                with self.telemetry.llm_call("repair", table.name) as call:
+                    output = await self.scheduler.acall(
+                        lambda: chain.ainvoke(chain_input, config=call.config),
+                        self.scheduler.estimate(GRAPH_REPAIR_PROMPT.text(**chain_input), "repair"), call.on_retry,
+                    )
+            graph_documents[index] = self.repaired_graph_document(table, graph_document, issues, semantics, output)
+            repaired = True
+        if repaired:
+            self.graph_store.put(key, graph_documents)
+        return graph_documents
+
+    def build_plan(self):
+        # The LLM calls the next build would make per stage, read from the caches only: nothing is called and
+        # nothing connects. Token counts are estimates, completions use the expected sizes of the scheduler.
+        plan = defaultdict(lambda: {"cached": 0, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+
+        def add(stage, prompt_text, cached, completion_tokens, table_names, input_text):
+            entry = plan[stage]
+            if cached:
+                entry["cached"] += 1
+                return
+            prompt_tokens = estimate_tokens(prompt_text)
+            # Routed calls are priced at the tier they are routed to, escalations can't be known in advance.
+            model_name = self.tier_model_name(self.route(table_names, input_text))
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cost_usd"] += estimate_cost(model_name, prompt_tokens, completion_tokens)
+
+        if self.extraction_mode == "structural":
+            for table in self.tables:
+                table_infos, chain_input = self.semantics_inputs(table)
+                cached = self.semantics_cache.get(self.semantics_cache.key(table_infos)) is not None
+                add(
+                    "semantics", TABLE_SEMANTICS_PROMPT.text(**chain_input), cached,
+                    EXPECTED_COMPLETION_TOKENS["semantics"], [table.name], "\n".join(chain_input.values()),
+                )
+            return dict(plan)
+
+        chunks = []
+        for table in self.tables:
+            augmented_infos = self.augmentation_cache.get(self.augmentation_cache.key(table.ddl))
+            add(
+                "augmentation", DATA_AUGMENTATION_PROMPT.text(input_schema=table.ddl), augmented_infos is not None,
+                EXPECTED_COMPLETION_TOKENS["augmentation"], [table.name], table.ddl,
+            )
+            # Until the table is augmented, its DDL stands in for the chunk.
+            chunks.append(Document(page_content=augmented_infos or table.ddl, metadata={"table_name": table.name}))
+        for pack in self.extraction_packs(chunks):
+            document = self.graph_input_document(pack)
+            cached = os.path.exists(self.graph_store.path(self.graph_store.key(document.page_content)))
+            prompt, completion_tokens = self.extraction_prompt
+            add(
+                "extraction", prompt.text(input=document.page_content), cached, completion_tokens * len(pack), [chunk.metadata["table_name"] for chunk in pack],
+                document.page_content,
+            )
+        return dict(plan)
+
+    def extraction_packs(self, chunks):
+        # With pack_max_tokens, small tables share one extraction call (and its long system prompt).
+        if not self.pack_max_tokens:
+            return [[chunk] for chunk in chunks]
+        return pack_chunks(chunks, self.pack_max_tokens, self.pack_max_tables)
+
+    @property
+    def packs_tables(self):
+        # Structural builds describe one table per call, packing only applies to the extraction.
+        return bool(self.pack_max_tokens) and self.extraction_mode != "structural"
 
     def create_kg(self):
-        for chunk in self.augmented_schema_chunks:
-            print("Chunk:", chunk)
-            graph_from_docs = self.llm_transformer.convert_to_graph_documents([chunk])
-            self.graph.add_graph_documents(graph_from_docs, include_source=True)
+        self.writer.setup(self.node_labels)
+        if self.streaming and not self.packs_tables:
+            asyncio.run(self.astream_kg())
+        elif self.extraction_mode == "structural":
+            self.create_structural_kg()
+        elif self.max_concurrency > 1:
+            # One event loop for both stages, the async LLM client can't be used again once its loop is closed.
+            asyncio.run(self.aaugment_and_create_kg())
+        else:
+            for chunks in self.extraction_packs(self.augmented_schema_chunks):
+                self.write_graph_documents(self.extract_graph_documents(chunks))
+        self.finish_build()
+
+    async def abuild_kg(self):
+        # create_kg from a running event loop, like the build service's: the tables stream through the stages and
+        # the blocking Neo4j and file work runs in threads.
+        await asyncio.to_thread(self.writer.setup, self.node_labels)
+        if self.packs_tables:
+            # Packs are made of consecutive chunks, so every table is augmented before the packs are extracted.
+            await self.aaugment_and_create_kg()
+        else:
+            await self.astream_kg()
+        await asyncio.to_thread(self.finish_build)
+
+    def finish_build(self):
+        # Writes are batched, per table write times only count buffering and the flushes they trigger.
+        with self.telemetry.timed("flush"):
+            self.writer.flush()
+        self.manifest.save()
+        self.save_quality_report()
+        self.save_join_index()
+        self.update_embeddings()
+        self.writer.report()
+        self.telemetry.print_summary()
+        if self.router is not None:
+            self.router.print_report()
+
+    def save_quality_report(self):
+        self.quality_report.save()
+        if self.quality_report.tables:
+            print("Quality report:", self.quality_report.summary())
+
+    def save_join_index(self):
+        JoinIndex.from_manifest(self.manifest).save(self.join_index_path)
+
+    def update_embeddings(self):
+        if self.embedding_index is not None:
+            with self.telemetry.timed("embedding"):
+                self.embedding_index.flush()
+
+    def write_graph_documents(self, graph_documents):
+        table_name = graph_documents[0].source.metadata["table_name"] if graph_documents else None
+        # A pack writes several tables at once, the event is named after the first one and counts them all.
+        with self.telemetry.timed("write", table_name, tables=len(graph_documents)):
+            self.writer.write(graph_documents)
+        if self.embedding_index is not None:
+            self.embedding_index.add_graph_documents(graph_documents)
+        for graph_document in graph_documents:
+            table = self.tables_by_name[graph_document.source.metadata["table_name"].lower()]
+            self.manifest.record(table, [graph_document])
+
+    async def acreate_kg(self, chunks):
+        # Extraction and Neo4j writes run as two stages linked by a bounded queue, so they overlap.
+        # An extraction worker waits until its result is queued, so a slow Neo4j also stops new LLM calls.
+        stages = [(self.aextract_graph_documents, self.max_concurrency), (self.awrite_graph_documents, 1)]
+        await run_pipeline(self.extraction_packs(chunks), stages, self.max_concurrency)
+
+    async def aaugment_and_create_kg(self):
+        await self.acreate_kg(await self.atransform_schema_to_langchain_documents(self.tables))
+
+    async def aaugment_table(self, table):
+        augmented_infos = await self.arun_cached_table_chain(
+            "augmentation", DATA_AUGMENTATION_PROMPT, self.augmentation_cache, table, table.ddl, {"input_schema": table.ddl}
+        )
+        return Document(page_content=augmented_infos, metadata={"table_name": table.name})
+
+    async def adescribe_table(self, table):
+        table_infos, chain_input = self.semantics_inputs(table)
+        output = await self.arun_cached_table_chain(
+            "semantics", TABLE_SEMANTICS_PROMPT, self.semantics_cache, table, table_infos, chain_input
+        )
+        return [table_to_graph_document(table, self.tables_by_name, self.parse_semantics(output))]
+
+    async def aextract_table(self, chunk):
+        return await self.aextract_graph_documents([chunk])
+
+    async def awrite_graph_documents(self, graph_documents):
+        await asyncio.to_thread(self.write_graph_documents, graph_documents)
+
+    async def astream_kg(self):
+        # Each table goes through the stages on its own, with max_concurrency LLM calls per stage and a single writer.
+        if self.extraction_mode == "structural":
+            stages = [(self.adescribe_table, self.max_concurrency)]
+        else:
+            # Tables come one by one here, each is extracted as a pack of one.
+            stages = [(self.aaugment_table, self.max_concurrency), (self.aextract_table, self.max_concurrency)]
+        await run_pipeline(self.tables, stages + [(self.awrite_graph_documents, 1)], self.max_concurrency)
+
+    def create_structural_kg(self):
+        for graph_documents in self.build_graph_documents(self.tables):
+            self.write_graph_documents(graph_documents)
+
+    def build_graph_documents(self, tables):
+        # One list of graph documents per table, in the tables order.
+        if self.extraction_mode == "structural":
+            return [
+                [table_to_graph_document(table, self.tables_by_name, table_semantics)]
+                for table, table_semantics in zip(tables, self.describe_tables(tables))
+            ]
+        # Augmented chunks come from the cache, only the given tables are looked up.
+        graph_documents = {}
+        for chunks in self.extraction_packs(self.transform_schema_to_langchain_documents(tables)):
+            for graph_document in self.extract_graph_documents(chunks):
+                graph_documents[graph_document.source.metadata["table_name"]] = [graph_document]
+        return [graph_documents[table.name] for table in tables]
+
+    def sync_kg(self):
+        # Incremental build: only added and changed tables are augmented and extracted again, and each one is
+        # replaced in Neo4j in its own transaction, removing the nodes and edges it doesn't have anymore.
+        schema_diff = self.manifest.diff(self.tables)
+        print("Schema diff:", schema_diff.summary())
+        changed_tables = [
+            table for table in self.tables if table.name in schema_diff.added or table.name in schema_diff.changed
+        ]
+
+        self.writer.setup(self.node_labels)
+        for table, graph_documents in zip(changed_tables, self.build_graph_documents(changed_tables)):
+            stale_nodes, stale_relationships = self.manifest.stale_entries(table.name, graph_documents)
+            with self.telemetry.timed("write", table.name):
+                self.writer.replace_table(table.name, graph_documents, stale_nodes, stale_relationships)
+            if self.embedding_index is not None:
+                self.embedding_index.remove([node_id for _, node_id in stale_nodes])
+                self.embedding_index.add_graph_documents(graph_documents)
+            self.manifest.record(table, graph_documents)
+            self.manifest.save()
+
+        for table_name in schema_diff.removed:
+            with self.telemetry.timed("delete", table_name):
+                self.writer.delete_table(table_name, [tuple(node) for node in self.manifest.tables[table_name]["nodes"]])
+            if self.embedding_index is not None:
+                self.embedding_index.remove_table(table_name)
+            del self.manifest.tables[table_name]
+            self.quality_report.tables.pop(table_name, None)
+            self.manifest.save()
+        self.save_quality_report()
+        self.save_join_index()
+        self.update_embeddings()
+        self.writer.report()
+        self.telemetry.print_summary()
+        if self.router is not None:
+            self.router.print_report()
+        return schema_diff
 
 if __name__ == "__main__":
-    db_to_graph = DBToGraph(MONDIAL_SCHEMA)
+    db_to_graph = DBToGraph(MONDIAL_SCHEMA, max_concurrency=8)
     db_to_graph.create_kg()
     print("Graph created successfully!")
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+
+def split_schema_tables(schema):
+    # The text before the first "CREATE TABLE" is not a table, skip it instead of sending it to the LLM.
+    return [f"CREATE TABLE {table}" for table in schema.split("CREATE TABLE") if table.strip()]
+
+
+def normalize_ddl(table_infos):
+    # Whitespace and trailing semicolons don't change a table, so they don't change its key either.
+    return re.sub(r"\s+", " ", table_infos).strip().rstrip(";").strip()
+
+
+def atomic_write(path, content):
+    # Write to a temp file in the same directory and rename it, readers never see half written files.
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class AugmentationCache:
+    def __init__(self, cache_dir, prompt_version, model_name):
+        self.cache_dir = cache_dir
+        self.prompt_version = prompt_version
+        self.model_name = model_name
+
+    def key(self, table_infos):
+        payload = json.dumps([normalize_ddl(table_infos), self.prompt_version, self.model_name])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self.path(key), "r") as file:
+                return json.load(file)["augmented_infos"]
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, table_infos, augmented_infos):
+        # DDL, prompt and model are stored next to the output to make the cache entries easy to inspect.
+        entry = {
+            "table_infos": table_infos,
+            "prompt_version": self.prompt_version,
+            "model_name": self.model_name,
+            "augmented_infos": augmented_infos,
+        }
+        atomic_write(self.path(key), json.dumps(entry, indent=2))
@@ -0,0 +1,114 @@
+import json
+import os
+import time
+import uuid
+
+from pipeline.augmentation_cache import atomic_write
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+
+def batch_custom_id(stage, table_name, key):
+    # Stable across runs for the same table, DDL, prompt version and model, so results can always be matched back.
+    return f"{stage}:{table_name}:{key[:16]}"
+
+
+def batch_request(custom_id, model_name, messages, temperature=0):
+    from langchain_core.messages import convert_to_openai_messages
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_URL,
+        "body": {"model": model_name, "temperature": temperature, "messages": convert_to_openai_messages(messages)},
+    }
+
+
+def write_jsonl(path, rows):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    atomic_write(path, "".join(json.dumps(row) + "\n" for row in rows))
+
+
+def read_batch_results(path):
+    # custom_id -> (content, usage), failed requests are left out and run again in real time.
+    results = {}
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                continue
+            body = response["body"]
+            results[result["custom_id"]] = (body["choices"][0]["message"]["content"], body.get("usage") or {})
+    return results
+
+
+def batch_result(custom_id, content=None, usage=None, error=None):
+    # Same line format as the OpenAI Batch API output file.
+    return {
+        "id": f"batch_req_{uuid.uuid4().hex}",
+        "custom_id": custom_id,
+        "response": None if error else {
+            "status_code": 200,
+            "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}], "usage": usage},
+        },
+        "error": {"message": error} if error else None,
+    }
+
+
+class LocalBatchSubmitter:
+    # File based stand-in for the Batch API: answers every request of the file with a chat model, locally.
+    def __init__(self, llm, max_concurrency=8):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+
+    def run(self, requests_path, results_path):
+        with open(requests_path) as file:
+            requests = [json.loads(line) for line in file if line.strip()]
+        responses = self.llm.batch(
+            [request["body"]["messages"] for request in requests],
+            config={"max_concurrency": self.max_concurrency},
+            return_exceptions=True,
+        )
+        results = []
+        for request, response in zip(requests, responses):
+            if isinstance(response, Exception):
+                results.append(batch_result(request["custom_id"], error=str(response)))
+                continue
+            usage = response.usage_metadata or {}
+            results.append(batch_result(request["custom_id"], response.content, {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0),
+            }))
+        write_jsonl(results_path, results)
+        return results_path
+
+
+class OpenAIBatchSubmitter:
+    def __init__(self, client=None, poll_seconds=30, completion_window="24h"):
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI()
+        self.client = client
+        self.poll_seconds = poll_seconds
+        self.completion_window = completion_window
+
+    def run(self, requests_path, results_path):
+        with open(requests_path, "rb") as file:
+            input_file = self.client.files.create(file=file, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=CHAT_COMPLETIONS_URL, completion_window=self.completion_window
+        )
+        print(f"Submitted batch {batch.id}, waiting for it to complete...")
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(self.poll_seconds)
+            batch = self.client.batches.retrieve(batch.id)
+        if batch.status == "failed":
+            raise RuntimeError(f"Batch {batch.id} failed: {batch.errors}")
+
+        # Expired and cancelled batches still return what was done, the rest goes to real time calls.
+        content = self.client.files.content(batch.output_file_id).text if batch.output_file_id else ""
+        os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+        atomic_write(results_path, content)
+        return results_path
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from pipeline.augmentation_cache import normalize_ddl
+from pipeline.neo4j_writer import DEFAULT_BATCH_SIZE, Neo4jBulkWriter, create_driver
+from pipeline.rate_limiter import RequestScheduler
+from pipeline.streaming import iter_tables
+
+# Options that change how a build runs, not what it writes, a job submitted again with other values is the same job.
+EXECUTION_OPTIONS = {"max_concurrency"}
+
+
+def schema_hash(tables):
+    # Same tables (whitespace and case aside) give the same hash, and the same cache: the cached entries are keyed on
+    # their prompt version and model, so builds with other options share them.
+    content = "\n".join(normalize_ddl(table.ddl) for table in tables)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def job_key(schema_key, options):
+    options = {name: value for name, value in options.items() if name not in EXECUTION_OPTIONS}
+    return hashlib.sha256(f"{schema_key}\n{json.dumps(options, sort_keys=True)}".encode()).hexdigest()
+
+
+class BuildJob:
+    def __init__(self, key, schema_key, tables, options):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.schema_key = schema_key
+        self.tables = tables
+        self.options = options
+        self.state = "queued"
+        self.created_at = time.time()
+        self.result = None
+        self.error = None
+        # Telemetry events and state changes, in order, for the progress streams.
+        self.events = []
+        self.updated = asyncio.Event()
+
+    def publish(self, event):
+        # Called on the event loop, build threads go through call_soon_threadsafe.
+        self.events.append(event)
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+    def set_state(self, state, **fields):
+        self.state = state
+        self.publish({"stage": "job", "state": state, "timestamp": time.time(), **fields})
+
+    @property
+    def namespace(self):
+        # Label prefix of the job's nodes, so jobs of other schemas (or options) with the same table names don't
+        # MERGE into them. The same job submitted again writes into the same nodes.
+        return f"g{self.key[:12]}_"
+
+    @property
+    def finished(self):
+        return self.state in ("done", "failed")
+
+    async def stream(self):
+        # Every event since the job was created, then the new ones as they come, until the job is finished.
+        position = 0
+        while True:
+            updated = self.updated
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.finished:
+                return
+            await updated.wait()
+
+    def to_dict(self):
+        return {
+            "id": self.id, "key": self.key, "namespace": self.namespace, "state": self.state, "tables": len(self.tables),
+            "options": self.options, "created_at": self.created_at, "result": self.result, "error": self.error,
+        }
+
+
+class BuildService:
+    # Runs schema builds from a queue on a pool of async workers. Every build shares the same LLM client, request
+    # scheduler (so the rate limits hold across builds) and pooled Neo4j driver, and a schema submitted again gets
+    # the job of its first build back.
+    def __init__(self, llm=None, driver=None, workers=4, cache_root="service_cache", scheduler=None,
+                 writer_factory=None, write_batch_size=DEFAULT_BATCH_SIZE):
+        self.llm = llm
+        self.driver = driver
+        self.workers = workers
+        self.cache_root = cache_root
+        self.scheduler = scheduler
+        self.writer_factory = writer_factory
+        self.write_batch_size = write_batch_size
+        self.jobs = {}
+        self.jobs_by_key = {}
+        self.queue = None
+        self.tasks = []
+        self.loop = None
+
+    async def start(self):
+        # Clients are created here, once, so every build after the first one starts warm.
+        if self.llm is None:
+            from langchain_openai import ChatOpenAI
+            self.llm = ChatOpenAI(temperature=0, model_name="gpt-4o", max_retries=0)
+        self.scheduler = self.scheduler or RequestScheduler()
+        if self.writer_factory is None and self.driver is None:
+            self.driver = create_driver()
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.driver is not None:
+            self.driver.close()
+
+    async def submit(self, schema, force=False, **options):
+        # The schema is DDL text or the tables of reflect_database, options go to DBToGraph.
+        tables = await asyncio.to_thread(lambda: list(iter_tables(schema)))
+        schema_key = schema_hash(tables)
+        key = job_key(schema_key, options)
+        job = self.jobs_by_key.get(key)
+        if job is not None and job.state != "failed" and not force:
+            return job
+        job = BuildJob(key, schema_key, tables, options)
+        self.jobs[job.id] = job
+        self.jobs_by_key[key] = job
+        job.set_state("queued")
+        await self.queue.put(job)
+        return job
+
+    def create_writer(self, job):
+        if self.writer_factory is not None:
+            return self.writer_factory(job)
+        return Neo4jBulkWriter(
+            driver=self.driver, batch_size=self.write_batch_size, include_source=True, label_prefix=job.namespace
+        )
+
+    async def build(self, job):
+        from graph_builder import DBToGraph
+
+        def hook(event):
+            # Writes report their events from threads.
+            self.loop.call_soon_threadsafe(job.publish, event)
+
+        writer = self.create_writer(job)
+        try:
+            # Each schema has its own cache, a job submitted again after a restart replays it without LLM calls.
+            db_to_graph = await asyncio.to_thread(
+                DBToGraph, job.tables, cache_dir=os.path.join(self.cache_root, job.schema_key[:16]), llm=self.llm,
+                writer=writer, scheduler=self.scheduler, telemetry_hooks=[hook], streaming=True, **job.options,
+            )
+            # Builds stream on the service loop, the async LLM client is shared by all of them.
+            await db_to_graph.abuild_kg()
+        finally:
+            await asyncio.to_thread(writer.close)
+        manifest = db_to_graph.manifest.tables.values()
+        return {
+            "namespace": job.namespace,
+            "tables": len(db_to_graph.tables),
+            "nodes": sum(len(entry["nodes"]) for entry in manifest),
+            "relationships": sum(len(entry["relationships"]) for entry in manifest),
+            "quality": db_to_graph.quality_report.summary() if db_to_graph.quality_report.tables else None,
+            "stages": {stage: dict(values) for stage, values in db_to_graph.telemetry.summary().items()},
+        }
+
+    async def work(self):
+        while True:
+            job = await self.queue.get()
+            job.set_state("running")
+            try:
+                job.result = await self.build(job)
+                job.set_state("done")
+            except Exception as error:
+                job.error = repr(error)
+                job.set_state("failed", error=job.error)
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,86 @@
+import json
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+
+# Positions of a column row in the compact answer.
+COLUMN_FIELDS = ("column_name", "data_type", "flags", "references", "column_description")
+
+
+def decode_column_row(row):
+    # Short rows are padded, extra fields dropped, so a sloppy row still gives its column.
+    values = [str(value or "").strip() for value in list(row or [])[:len(COLUMN_FIELDS)]]
+    return dict(zip(COLUMN_FIELDS, values + [""] * (len(COLUMN_FIELDS) - len(values))))
+
+
+def graph_node(node_id, node_type, properties=None):
+    # Formatted like the LLMGraphTransformer's nodes (title-cased ids, capitalized types), so both modes write the
+    # same labels and ids.
+    return Node(id=node_id.title(), type=node_type.capitalize(), properties=properties or {})
+
+
+def format_graph_document(graph_document):
+    # A document built from the DDL (a repaired table), with its ids and types formatted like the extracted ones.
+    def format_node(node):
+        return graph_node(node.id, node.type, node.properties)
+
+    return GraphDocument(
+        nodes=[format_node(node) for node in graph_document.nodes],
+        relationships=[
+            Relationship(
+                source=format_node(relationship.source), target=format_node(relationship.target),
+                type=relationship.type, properties=relationship.properties,
+            )
+            for relationship in graph_document.relationships
+        ],
+        source=graph_document.source,
+    )
+
+
+def compact_table_to_graph_document(table_name, entry, source):
+    # Same nodes and relationships as the LLMGraphTransformer answer of one table, ids use the chunk's table name.
+    columns = [decode_column_row(row) for row in entry.get("columns") or []]
+    columns = [column for column in columns if column["column_name"]]
+    foreign_keys = {column["column_name"]: column["references"] for column in columns if column["references"]}
+
+    table_node = graph_node(table_name, "TABLE", {
+        "table_name": table_name,
+        "columns": [column["column_name"] for column in columns],
+        "primary_key": [column["column_name"] for column in columns if "P" in column["flags"].upper()],
+        "foreign_keys": [json.dumps({column: target}) for column, target in foreign_keys.items()],
+        "table_description": entry.get("description") or "",
+    })
+    nodes, relationships = [table_node], []
+    for column in columns:
+        column_node = graph_node(f"{table_name}.{column['column_name']}", "COLUMN", {
+            "column_name": column["column_name"],
+            "data_type": column["data_type"],
+            "is_nullable": "N" in column["flags"].upper(),
+            "is_primary_key": "P" in column["flags"].upper(),
+            "is_foreign_key": column["column_name"] in foreign_keys,
+            "column_description": column["column_description"],
+        })
+        nodes.append(column_node)
+        relationships.append(Relationship(source=column_node, target=table_node, type="IS_COLUMN_OF"))
+        if column["column_name"] in foreign_keys:
+            relationships.append(Relationship(
+                source=column_node, target=graph_node(foreign_keys[column["column_name"]], "COLUMN"),
+                type="FOREIGN_KEY_OF",
+            ))
+    return GraphDocument(nodes=nodes, relationships=relationships, source=source)
+
+
+def decode_compact_graph(output, chunks):
+    # One graph document per chunk, like split_pack. A table missing from the answer gets an empty document,
+    # validation reports it and the repair rebuilds it from the DDL.
+    tables = (output or {}).get("tables") or []
+    entries = {str(entry.get("table", "")).strip().lower(): entry for entry in tables}
+    graph_documents = []
+    for chunk in chunks:
+        table_name = chunk.metadata["table_name"]
+        # The only table of a one table pack is that table, whatever name it came back with.
+        entry = tables[0] if len(chunks) == 1 and len(tables) == 1 else entries.get(table_name.lower())
+        if entry is None:
+            graph_documents.append(GraphDocument(nodes=[], relationships=[], source=chunk))
+        else:
+            graph_documents.append(compact_table_to_graph_document(table_name, entry, chunk))
+    return graph_documents
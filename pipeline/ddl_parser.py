@@ -0,0 +1,267 @@
+import re
+from dataclasses import dataclass, field
+
+from pipeline.augmentation_cache import split_schema_tables
+
+# Words that end a column data type and start its constraints.
+COLUMN_KEYWORDS = {
+    "NOT", "NULL", "UNIQUE", "PRIMARY", "CHECK", "REFERENCES", "DEFAULT", "CONSTRAINT",
+    "COLLATE", "AUTO_INCREMENT", "AUTOINCREMENT", "GENERATED", "IDENTITY", "COMMENT",
+}
+TABLE_CONSTRAINT_KEYWORDS = {"PRIMARY", "UNIQUE", "CHECK", "FOREIGN"}
+
+
+@dataclass
+class ForeignKey:
+    columns: list
+    referenced_table: str
+    referenced_columns: list
+
+
+@dataclass
+class ColumnDefinition:
+    name: str
+    data_type: str
+    is_nullable: bool = True
+    is_unique: bool = False
+    default: str = None
+    comment: str = None
+
+
+@dataclass
+class TableDefinition:
+    name: str
+    columns: list = field(default_factory=list)
+    primary_key: list = field(default_factory=list)
+    unique_keys: list = field(default_factory=list)
+    check_constraints: list = field(default_factory=list)
+    foreign_keys: list = field(default_factory=list)
+    comment: str = None
+    ddl: str = ""
+
+    def column(self, name):
+        for column in self.columns:
+            if column.name.lower() == name.lower():
+                return column
+        return None
+
+
+# Quoted strings and identifiers come first so the comment markers inside them ("DEFAULT 'a -- b'") are kept.
+COMMENT_OR_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|/\*.*?\*/|--[^\n]*", re.S)
+
+
+def strip_comments(ddl):
+    return COMMENT_OR_QUOTED.sub(lambda match: " " if match.group(0)[0] in "/-" else match.group(0), ddl)
+
+
+def closing_index(text, char, start):
+    # A doubled quote ('it''s') is part of the string.
+    end = text.find(char, start)
+    while end >= 0 and char != "]" and text[end + 1:end + 2] == char:
+        end = text.find(char, end + 2)
+    if end < 0:
+        raise ValueError(f"Unclosed {text[start - 1]} in DDL: {text[start - 1:start + 79]!r}")
+    return end
+
+
+def unquote(identifier):
+    if identifier[:1] in "\"'`[" and len(identifier) > 1:
+        return identifier[1:-1]
+    return identifier
+
+
+def tokenize(text):
+    # Parenthesized groups and quoted strings are kept as single tokens.
+    tokens, i = [], 0
+    while i < len(text):
+        char = text[i]
+        if char.isspace():
+            i += 1
+        elif char == "(":
+            depth, j = 0, i
+            while j < len(text):
+                if text[j] in "'\"":
+                    j = closing_index(text, text[j], j + 1)
+                elif text[j] == "(":
+                    depth += 1
+                elif text[j] == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                j += 1
+            if depth:
+                raise ValueError(f"Unclosed ( in DDL: {text[i:i + 80]!r}")
+            tokens.append(text[i:j + 1])
+            i = j + 1
+        elif char in "'\"`[":
+            end = closing_index(text, "]" if char == "[" else char, i + 1)
+            tokens.append(text[i:end + 1])
+            i = end + 1
+        elif char == ",":
+            tokens.append(char)
+            i += 1
+        else:
+            match = re.match(r"[^\s(),'\"`\[]+", text[i:])
+            tokens.append(match.group(0))
+            i += len(match.group(0))
+    return tokens
+
+
+def split_top_level(tokens):
+    items, current = [], []
+    for token in tokens:
+        if token == ",":
+            items.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        items.append(current)
+    return [item for item in items if item]
+
+
+def group_names(group):
+    # "(Name, Country)" -> ["Name", "Country"]
+    return [unquote(item[0]) for item in split_top_level(tokenize(group[1:-1]))]
+
+
+def inner(group):
+    return re.sub(r"\s+", " ", group[1:-1]).strip()
+
+
+def parse_table_constraint(table, tokens):
+    name = None
+    if tokens[0].upper() == "CONSTRAINT":
+        tokens = tokens[1:]
+        # Constraints can be unnamed, like "CONSTRAINT CHECK (Length > 0)".
+        if tokens and tokens[0].upper() not in TABLE_CONSTRAINT_KEYWORDS:
+            name, tokens = unquote(tokens[0]), tokens[1:]
+    kind = tokens[0].upper()
+    if kind == "PRIMARY":
+        table.primary_key = group_names(tokens[2])
+    elif kind == "UNIQUE":
+        table.unique_keys.append(group_names(tokens[-1]))
+    elif kind == "CHECK":
+        table.check_constraints.append(f"{name}: {inner(tokens[1])}" if name else inner(tokens[1]))
+    elif kind == "FOREIGN":
+        referenced = tokens.index(next(token for token in tokens if token.upper() == "REFERENCES"))
+        table.foreign_keys.append(ForeignKey(
+            columns=group_names(tokens[2]),
+            referenced_table=unquote(tokens[referenced + 1]),
+            referenced_columns=group_names(tokens[referenced + 2]) if len(tokens) > referenced + 2 else [],
+        ))
+
+
+def parse_column(table, tokens):
+    column_name = unquote(tokens[0])
+    type_tokens, i = [], 1
+    while i < len(tokens) and tokens[i].upper() not in COLUMN_KEYWORDS:
+        type_tokens.append(tokens[i])
+        i += 1
+    # "VARCHAR (35)" and "VARCHAR(35)" are the same type.
+    column = ColumnDefinition(name=column_name, data_type=re.sub(r"\s+\(", "(", " ".join(type_tokens)).upper())
+
+    while i < len(tokens):
+        token = tokens[i].upper()
+        if token == "NOT" and i + 1 < len(tokens) and tokens[i + 1].upper() == "NULL":
+            column.is_nullable = False
+            i += 2
+        elif token == "PRIMARY":
+            table.primary_key = [column_name]
+            column.is_nullable = False
+            i += 2
+        elif token == "UNIQUE":
+            column.is_unique = True
+            table.unique_keys.append([column_name])
+            i += 1
+        elif token == "CHECK":
+            table.check_constraints.append(inner(tokens[i + 1]))
+            i += 2
+        elif token == "DEFAULT":
+            column.default = tokens[i + 1]
+            i += 2
+        elif token == "COMMENT":
+            column.comment = unquote(tokens[i + 1])
+            i += 2
+        elif token == "REFERENCES":
+            referenced_columns = []
+            if i + 2 < len(tokens) and tokens[i + 2].startswith("("):
+                referenced_columns = group_names(tokens[i + 2])
+            table.foreign_keys.append(ForeignKey([column_name], unquote(tokens[i + 1]), referenced_columns))
+            i += 2
+        else:
+            # NULL, CONSTRAINT names, COLLATE, identity options... nothing the graph needs.
+            i += 1
+    table.columns.append(column)
+
+
+IDENTIFIER = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|[\w$]+)'
+CREATE_TABLE = re.compile(
+    rf"CREATE\s+(?:\w+\s+)*?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?({IDENTIFIER}(?:\s*\.\s*{IDENTIFIER})*)\s*\(",
+    re.I,
+)
+
+
+def parse_create_table(ddl):
+    text = strip_comments(ddl)
+    match = CREATE_TABLE.search(text)
+    if match is None:
+        raise ValueError(f"Not a CREATE TABLE statement: {ddl[:80]!r}")
+    # Schema qualified names keep their dots, only the quotes are dropped.
+    name = ".".join(unquote(part.strip()) for part in re.findall(rf"{IDENTIFIER}", match.group(1)))
+    table = TableDefinition(name=name, ddl=ddl.strip())
+    body = tokenize(text[match.end() - 1:])[0]
+
+    for item in split_top_level(tokenize(body[1:-1])):
+        if item[0].upper() in TABLE_CONSTRAINT_KEYWORDS | {"CONSTRAINT", "KEY", "INDEX"}:
+            if item[0].upper() not in {"KEY", "INDEX"}:
+                parse_table_constraint(table, item)
+        else:
+            parse_column(table, item)
+
+    for column in table.columns:
+        if column.name.lower() in {name.lower() for name in table.primary_key}:
+            column.is_nullable = False
+    return table
+
+
+def parse_schema(schema):
+    return [parse_create_table(table_infos) for table_infos in split_schema_tables(schema)]
+
+
+def quote_identifier(name):
+    return name if re.fullmatch(r"[A-Za-z_][\w$]*", name) else '"' + name.replace('"', '""') + '"'
+
+
+def quote_string(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+def render_ddl(table):
+    # The CREATE TABLE statement of a table built from something else than DDL (database introspection), in the
+    # layout of the Mondial schema, parse_create_table reads it back.
+    names = lambda columns: ", ".join(quote_identifier(column) for column in columns)
+    lines = []
+    for column in table.columns:
+        line = f"{quote_identifier(column.name)} {column.data_type}"
+        line += "" if column.is_nullable else " NOT NULL"
+        line += " UNIQUE" if column.is_unique else ""
+        line += f" DEFAULT {column.default}" if column.default is not None else ""
+        line += f" COMMENT {quote_string(column.comment)}" if column.comment else ""
+        lines.append(line)
+    if table.primary_key:
+        lines.append(f"PRIMARY KEY ({names(table.primary_key)})")
+    column_unique_keys = [[column.name] for column in table.columns if column.is_unique]
+    lines += [f"UNIQUE ({names(unique_key)})" for unique_key in table.unique_keys if unique_key not in column_unique_keys]
+    for check in table.check_constraints:
+        # Named checks are kept as "name: condition", like parse_table_constraint does.
+        match = re.fullmatch(r"([\w$]+): (.*)", check, re.S)
+        lines.append(f"CONSTRAINT {match.group(1)} CHECK ({match.group(2)})" if match else f"CHECK ({check})")
+    for foreign_key in table.foreign_keys:
+        referenced = ".".join(quote_identifier(part) for part in foreign_key.referenced_table.split("."))
+        line = f"FOREIGN KEY ({names(foreign_key.columns)}) REFERENCES {referenced}"
+        lines.append(line + (f" ({names(foreign_key.referenced_columns)})" if foreign_key.referenced_columns else ""))
+
+    name = ".".join(quote_identifier(part) for part in table.name.split("."))
+    ddl = f"CREATE TABLE {name}\n(" + ",\n ".join(lines) + ")"
+    return ddl + (f" COMMENT {quote_string(table.comment)}" if table.comment else "") + ";"
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from pipeline.augmentation_cache import atomic_write
+from pipeline.neo4j_writer import create_driver, quote_name, schema_name
+from pipeline.schema_diff import owns_node
+
+DESCRIPTION_PROPERTIES = ("table_description", "column_description")
+DEFAULT_EMBEDDING_BATCH_SIZE = 512
+MIN_CAPACITY = 1024
+
+
+def description_entries(graph_documents):
+    # (node id, node type, text) for every described node, the id gives the description its table and column names.
+    for graph_document in graph_documents:
+        for node in graph_document.nodes:
+            for key in DESCRIPTION_PROPERTIES:
+                description = node.properties.get(key)
+                if description:
+                    yield node.id, node.type, f"{node.id}: {description}"
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def create_embedder():
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model="text-embedding-3-small")
+
+
+def embedder_name(embedder):
+    return getattr(embedder, "model", None) or type(embedder).__name__
+
+
+def normalize(vectors):
+    # Unit vectors, cosine similarity is then a dot product.
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class Neo4jVectorIndex:
+    # Mirrors the embeddings on the TABLE and COLUMN nodes, with one vector index per label.
+    def __init__(self, driver=None, database=None):
+        self.owns_driver = driver is None
+        self.driver = driver or create_driver()
+        self.database = database or os.environ.get("NEO4J_DATABASE")
+        self.available = True
+
+    @staticmethod
+    def index_name(label):
+        return schema_name(label, "description_embedding")
+
+    def setup(self, dimensions, labels=("TABLE", "COLUMN")):
+        from neo4j.exceptions import ClientError
+        try:
+            with self.driver.session(database=self.database) as session:
+                for label in labels:
+                    session.run(
+                        f"CREATE VECTOR INDEX {quote_name(self.index_name(label))} IF NOT EXISTS "
+                        f"FOR (n:{quote_name(label)}) ON n.embedding "
+                        f"OPTIONS {{indexConfig: {{`vector.dimensions`: $dimensions, `vector.similarity_function`: 'cosine'}}}}",
+                        dimensions=dimensions,
+                    ).consume()
+        except ClientError as error:
+            # Vector indexes need Neo4j 5.11+, the memory-mapped matrix still serves the searches.
+            print(f"Neo4j vector index not available, keeping embeddings local only: {error.message}")
+            self.available = False
+
+    def upsert(self, rows):
+        rows_by_label = {}
+        for row in rows:
+            rows_by_label.setdefault(row["type"], []).append({"id": row["id"], "embedding": row["embedding"]})
+        with self.driver.session(database=self.database) as session:
+            for label, label_rows in rows_by_label.items():
+                session.execute_write(lambda tx: tx.run(
+                    f"UNWIND $rows AS row MATCH (n:{quote_name(label)} {{id: row.id}}) "
+                    f"CALL db.create.setNodeVectorProperty(n, 'embedding', row.embedding)",
+                    rows=label_rows,
+                ).consume())
+
+    def search(self, vector, k=5, label="TABLE"):
+        with self.driver.session(database=self.database) as session:
+            result = session.run(
+                "CALL db.index.vector.queryNodes($index, $k, $vector) YIELD node, score RETURN node.id AS id, score",
+                index=self.index_name(label), k=k, vector=list(vector),
+            )
+            return [(record["id"], label, record["score"]) for record in result]
+
+    def close(self):
+        if self.owns_driver:
+            self.driver.close()
+
+
+class EmbeddingIndex:
+    # Embeddings of the table and column descriptions, one row per node in a memory-mapped float32 matrix.
+    # Only descriptions whose text hash changed are embedded again.
+    def __init__(self, index_dir, embedder=None, batch_size=DEFAULT_EMBEDDING_BATCH_SIZE, neo4j_index=None):
+        self.index_dir = index_dir
+        self.embedder = embedder or create_embedder()
+        self.model_name = embedder_name(self.embedder)
+        self.batch_size = batch_size
+        self.neo4j_index = neo4j_index
+        self.metadata_path = os.path.join(index_dir, "embeddings.json")
+        self.vectors_path = os.path.join(index_dir, "embeddings.npy")
+
+        self.ids, self.types, self.hashes = [], [], []
+        self.rows = {}
+        self.vectors = None
+        # Node id -> (type, text) waiting for the next flush.
+        self.pending = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.metadata_path):
+            return
+        with open(self.metadata_path, "r") as file:
+            metadata = json.load(file)
+        if metadata["model_name"] != self.model_name:
+            # Vectors of different models can't be compared, everything is embedded again.
+            return
+        self.ids, self.types, self.hashes = metadata["ids"], metadata["types"], metadata["hashes"]
+        self.rows = {node_id: row for row, node_id in enumerate(self.ids)}
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+    def save(self):
+        if self.vectors is not None:
+            self.vectors.flush()
+        atomic_write(self.metadata_path, json.dumps({
+            "model_name": self.model_name, "ids": self.ids, "types": self.types, "hashes": self.hashes,
+        }))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add_graph_documents(self, graph_documents):
+        for node_id, node_type, text in description_entries(graph_documents):
+            row = self.rows.get(node_id)
+            if row is None or self.hashes[row] != text_hash(text):
+                self.pending[node_id] = (node_type, text)
+
+    def ensure_capacity(self, rows, dimensions):
+        if self.vectors is not None and rows <= len(self.vectors):
+            return
+        # Grows by doubling into a new file, rows already embedded are copied over.
+        capacity = max(rows, 2 * len(self.vectors) if self.vectors is not None else 0, MIN_CAPACITY)
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_path = self.vectors_path + ".tmp"
+        vectors = open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dimensions))
+        if self.vectors is not None:
+            vectors[:len(self.ids)] = self.vectors[:len(self.ids)]
+        vectors.flush()
+        del vectors
+        self.vectors = None
+        os.replace(tmp_path, self.vectors_path)
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+    def store(self, entries, vectors):
+        for (node_id, (node_type, text)), vector in zip(entries, vectors):
+            row = self.rows.get(node_id)
+            if row is None:
+                # Grown before the id is added, the rows copied over are the ones already stored.
+                self.ensure_capacity(len(self.ids) + 1, len(vector))
+                row = self.rows[node_id] = len(self.ids)
+                self.ids.append(node_id)
+                self.types.append(node_type)
+                self.hashes.append(None)
+            self.vectors[row] = vector
+            self.hashes[row] = text_hash(text)
+
+    def flush(self):
+        entries = list(self.pending.items())
+        self.pending.clear()
+        if entries:
+            print(f"Embedding {len(entries)} descriptions...")
+        for start in range(0, len(entries), self.batch_size):
+            batch = entries[start:start + self.batch_size]
+            vectors = normalize(np.asarray(self.embedder.embed_documents([text for _, (_, text) in batch]), dtype=np.float32))
+            self.store(batch, vectors)
+            if self.neo4j_index is not None:
+                if start == 0:
+                    # One vector index per label the nodes were written with.
+                    self.neo4j_index.setup(vectors.shape[1], sorted({node_type for _, (node_type, _) in entries}))
+                if self.neo4j_index.available:
+                    self.neo4j_index.upsert([
+                        {"id": node_id, "type": node_type, "embedding": vector.tolist()}
+                        for (node_id, (node_type, _)), vector in zip(batch, vectors)
+                    ])
+        self.save()
+        return len(entries)
+
+    def remove(self, node_ids):
+        # The last row moves into the removed one, rows stay contiguous.
+        for node_id in node_ids:
+            row = self.rows.pop(node_id, None)
+            if row is None:
+                continue
+            last = len(self.ids) - 1
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.ids[row], self.types[row], self.hashes[row] = self.ids[last], self.types[last], self.hashes[last]
+                self.rows[self.ids[row]] = row
+            self.ids.pop()
+            self.types.pop()
+            self.hashes.pop()
+
+    def remove_table(self, table_name):
+        self.remove([node_id for node_id in self.ids if owns_node(table_name, node_id)])
+
+    def search(self, query, k=5, node_type=None):
+        # Top k (node id, node type, cosine similarity), node_type keeps only TABLE or COLUMN nodes, in any case.
+        if not self.ids:
+            return []
+        vector = normalize(np.asarray(self.embedder.embed_query(query), dtype=np.float32))
+        scores = self.vectors[:len(self.ids)] @ vector
+        if node_type is not None:
+            scores = np.where(np.char.upper(np.asarray(self.types)) == node_type.upper(), scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[row], self.types[row], float(scores[row])) for row in top if np.isfinite(scores[row])]
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+from pipeline.augmentation_cache import atomic_write
+
+
+def encode_graph_document(graph_document):
+    # Positional lists instead of dicts, node types and ids are repeated a lot.
+    return {
+        "nodes": [[node.id, node.type, node.properties] for node in graph_document.nodes],
+        "relationships": [
+            [rel.source.id, rel.source.type, rel.type, rel.target.id, rel.target.type, rel.properties]
+            for rel in graph_document.relationships
+        ],
+        "source": [graph_document.source.page_content, graph_document.source.metadata],
+    }
+
+
+def decode_graph_document(entry):
+    nodes = {(node_type, node_id): Node(id=node_id, type=node_type, properties=properties)
+             for node_id, node_type, properties in entry["nodes"]}
+
+    def node(node_id, node_type):
+        # Relationships can point to nodes of other chunks, those only exist as endpoints here.
+        return nodes.get((node_type, node_id)) or Node(id=node_id, type=node_type)
+
+    page_content, metadata = entry["source"]
+    return GraphDocument(
+        nodes=list(nodes.values()),
+        relationships=[
+            Relationship(source=node(source_id, source_type), target=node(target_id, target_type), type=rel_type,
+                         properties=properties)
+            for source_id, source_type, rel_type, target_id, target_type, properties in entry["relationships"]
+        ],
+        source=Document(page_content=page_content, metadata=metadata),
+    )
+
+
+class GraphDocumentStore:
+    # Extraction results on disk, keyed by the exact transformer input, the transformer configuration and the
+    # prompt version. Any build with the same chunks replays them without LLM calls, whatever graph it writes to.
+    def __init__(self, store_dir, prompt_version, transformer_config):
+        self.store_dir = store_dir
+        self.prompt_version = prompt_version
+        self.transformer_config = transformer_config
+
+    def key(self, chunk_text):
+        payload = json.dumps([chunk_text, self.prompt_version, self.transformer_config], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key):
+        # Sharded by key prefix, large schemas would otherwise put thousands of files in one directory.
+        return os.path.join(self.store_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self.path(key), "r") as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        return [decode_graph_document(graph_document) for graph_document in entry["graph_documents"]]
+
+    def put(self, key, graph_documents):
+        entry = {
+            "prompt_version": self.prompt_version,
+            "graph_documents": [encode_graph_document(graph_document) for graph_document in graph_documents],
+        }
+        atomic_write(self.path(key), json.dumps(entry, separators=(",", ":")))
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, inspect
+
+from pipeline.ddl_parser import ColumnDefinition, ForeignKey, TableDefinition, render_ddl
+
+SYSTEM_SCHEMAS = {"information_schema", "pg_catalog", "pg_toast", "mysql", "performance_schema", "sys"}
+
+# Tables reflected per call, so a single large schema is also spread over the workers.
+REFLECTION_BATCH_SIZE = 200
+
+
+def create_pooled_engine(url, pool_size):
+    # One connection per reflection worker, pre_ping drops connections the server closed while idle.
+    if url.startswith("sqlite"):
+        return create_engine(url)
+    return create_engine(url, pool_size=pool_size, max_overflow=0, pool_pre_ping=True)
+
+
+def reflect_optional(method, **kwargs):
+    # Not every dialect reflects check constraints or comments.
+    try:
+        return method(**kwargs)
+    except NotImplementedError:
+        return {}
+
+
+def qualified_name(schema, name, default_schema):
+    return name if schema is None or schema == default_schema else f"{schema}.{name}"
+
+
+def reflect_tables(engine, schema, table_names, default_schema):
+    with engine.connect() as connection:
+        inspector = inspect(connection)
+        kwargs = {"schema": schema, "filter_names": table_names}
+        columns = inspector.get_multi_columns(**kwargs)
+        primary_keys = inspector.get_multi_pk_constraint(**kwargs)
+        foreign_keys = inspector.get_multi_foreign_keys(**kwargs)
+        unique_constraints = reflect_optional(inspector.get_multi_unique_constraints, **kwargs)
+        check_constraints = reflect_optional(inspector.get_multi_check_constraints, **kwargs)
+        comments = reflect_optional(inspector.get_multi_table_comment, **kwargs)
+
+    tables = []
+    for key in sorted(columns, key=lambda key: table_names.index(key[1])):
+        unique_keys = [constraint["column_names"] for constraint in unique_constraints.get(key, [])]
+        table = TableDefinition(
+            name=qualified_name(schema, key[1], default_schema),
+            columns=[
+                ColumnDefinition(
+                    name=column["name"],
+                    data_type=str(column["type"]),
+                    is_nullable=column["nullable"],
+                    is_unique=[column["name"]] in unique_keys,
+                    default=column.get("default"),
+                    comment=column.get("comment"),
+                )
+                for column in columns[key]
+            ],
+            primary_key=(primary_keys.get(key) or {}).get("constrained_columns") or [],
+            unique_keys=unique_keys,
+            check_constraints=[
+                f"{check['name']}: {check['sqltext']}" if check.get("name") else check["sqltext"]
+                for check in check_constraints.get(key, [])
+            ],
+            foreign_keys=[
+                ForeignKey(
+                    columns=foreign_key["constrained_columns"],
+                    referenced_table=qualified_name(
+                        foreign_key.get("referred_schema"), foreign_key["referred_table"], default_schema
+                    ),
+                    referenced_columns=foreign_key["referred_columns"],
+                )
+                for foreign_key in foreign_keys.get(key, [])
+            ],
+            comment=(comments.get(key) or {}).get("text"),
+        )
+        for column in table.columns:
+            if column.name in table.primary_key:
+                column.is_nullable = False
+        # The rendered DDL is what gets augmented and what the caches are keyed on, as for DDL dumps.
+        table.ddl = render_ddl(table)
+        tables.append(table)
+    return tables
+
+
+def reflect_database(url, schemas=None, max_workers=8):
+    # Reflects the tables of a live database into TableDefinitions, the same units parse_create_table gives.
+    # Schemas, and batches of tables inside them, are reflected in parallel over a pooled engine.
+    engine = create_pooled_engine(url, max_workers)
+    try:
+        inspector = inspect(engine)
+        default_schema = inspector.default_schema_name
+        if schemas is None:
+            schemas = [schema for schema in inspector.get_schema_names() if schema.lower() not in SYSTEM_SCHEMAS]
+        batches = []
+        for schema in schemas:
+            table_names = inspector.get_table_names(schema=schema)
+            batches += [
+                (schema, table_names[start:start + REFLECTION_BATCH_SIZE])
+                for start in range(0, len(table_names), REFLECTION_BATCH_SIZE)
+            ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda batch: reflect_tables(engine, *batch, default_schema), batches)
+            # map keeps the batches order, so the tables come in schema and table order.
+            return [table for tables in results for table in tables]
+    finally:
+        engine.dispose()
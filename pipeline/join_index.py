@@ -0,0 +1,192 @@
+import json
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+
+from pipeline.augmentation_cache import atomic_write
+
+JOIN_RELATIONSHIPS = ("IS_COLUMN_OF", "FOREIGN_KEY_OF")
+
+NEO4J_QUERY = (
+    "MATCH (s)-[r:IS_COLUMN_OF|FOREIGN_KEY_OF]->(t) "
+    "WITH s, r, t, labels(s)[0] AS source_type, labels(t)[0] AS target_type "
+    "WHERE source_type STARTS WITH $label_prefix AND target_type STARTS WITH $label_prefix "
+    "RETURN source_type, s.id AS source, type(r) AS type, target_type, t.id AS target"
+)
+
+
+def is_table_type(node_type):
+    # "TABLE" in structural mode, "Table" in llm and compact modes.
+    return node_type.upper() == "TABLE"
+
+
+def strip_prefix(value, prefix):
+    return value[len(prefix):] if prefix and value.startswith(prefix) else value
+
+
+@dataclass(frozen=True)
+class JoinPath:
+    tables: tuple
+    # (column, column) pairs to join on, in path order.
+    joins: tuple
+
+    def __len__(self):
+        return len(self.joins)
+
+
+class JoinIndex:
+    # The TABLE / COLUMN graph in memory: node ids are interned to ints and edges kept as CSR arrays, walked both
+    # ways, so a join path is a BFS over a few arrays instead of a Cypher round trip.
+    def __init__(self, nodes, relationships, cache_size=4096):
+        self.ids = []
+        self.is_table = array("b")
+        self.positions = {}
+        for node_type, node_id in nodes:
+            self.intern(node_type, node_id)
+
+        # Edges as they were given (column -> table, column -> column), the CSR below has both directions.
+        self.edges = []
+        self.owners = {}
+        for source_type, source, relationship_type, target_type, target in relationships:
+            if relationship_type not in JOIN_RELATIONSHIPS:
+                continue
+            source, target = self.intern(source_type, source), self.intern(target_type, target)
+            self.edges.append((source, target, relationship_type == "FOREIGN_KEY_OF"))
+            if relationship_type == "IS_COLUMN_OF":
+                self.owners[source] = target
+
+        counts = array("l", [0] * (len(self.ids) + 1))
+        for source, target, _ in self.edges:
+            counts[source + 1] += 1
+            counts[target + 1] += 1
+        for position in range(len(self.ids)):
+            counts[position + 1] += counts[position]
+        self.offsets = array("l", counts)
+        self.neighbors = array("l", [0] * (2 * len(self.edges)))
+        next_slot = array("l", counts[:-1])
+        for source, target, _ in self.edges:
+            for node, neighbor in ((source, target), (target, source)):
+                self.neighbors[next_slot[node]] = neighbor
+                next_slot[node] += 1
+
+        self.tables_by_name = {node_id.lower(): position for position, node_id in enumerate(self.ids) if self.is_table[position]}
+        self.cached_join_paths = lru_cache(maxsize=cache_size)(self.find_join_paths)
+
+    def intern(self, node_type, node_id):
+        position = self.positions.get(node_id)
+        if position is None:
+            position = self.positions[node_id] = len(self.ids)
+            self.ids.append(node_id)
+            self.is_table.append(is_table_type(node_type))
+        return position
+
+    @classmethod
+    def from_manifest(cls, manifest, **kwargs):
+        # The build manifest has every node and relationship the last build wrote, no need to ask Neo4j.
+        nodes, relationships = [], []
+        for entry in manifest.tables.values():
+            nodes += [tuple(node) for node in entry["nodes"]]
+            relationships += [tuple(relationship) for relationship in entry["relationships"]]
+        return cls(nodes, relationships, **kwargs)
+
+    @classmethod
+    def from_neo4j(cls, graph, label_prefix="", id_prefix="", **kwargs):
+        # The prefixes of a namespaced build (see Neo4jBulkWriter), only its nodes are read, with their plain
+        # labels and ids.
+        rows = graph.query(NEO4J_QUERY, {"label_prefix": label_prefix})
+        relationships = [
+            (
+                strip_prefix(row["source_type"], label_prefix), strip_prefix(row["source"], id_prefix), row["type"],
+                strip_prefix(row["target_type"], label_prefix), strip_prefix(row["target"], id_prefix),
+            )
+            for row in rows
+        ]
+        return cls([], relationships, **kwargs)
+
+    def save(self, path):
+        nodes = [["TABLE" if is_table else "COLUMN", node_id] for node_id, is_table in zip(self.ids, self.is_table)]
+        relationships = [
+            [source, "FOREIGN_KEY_OF" if is_foreign_key else "IS_COLUMN_OF", target]
+            for source, target, is_foreign_key in self.edges
+        ]
+        atomic_write(path, json.dumps({"nodes": nodes, "relationships": relationships}, separators=(",", ":")))
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path, "r") as file:
+            artifact = json.load(file)
+        nodes = [tuple(node) for node in artifact["nodes"]]
+        relationships = [
+            (*nodes[source], relationship_type, *nodes[target])
+            for source, relationship_type, target in artifact["relationships"]
+        ]
+        return cls(nodes, relationships, **kwargs)
+
+    def shortest_path(self, source, target, removed_nodes=frozenset(), removed_edges=frozenset()):
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            if node == target:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parents[node]
+                return path[::-1]
+            for slot in range(self.offsets[node], self.offsets[node + 1]):
+                neighbor = self.neighbors[slot]
+                if neighbor not in parents and neighbor not in removed_nodes and (node, neighbor) not in removed_edges:
+                    parents[neighbor] = node
+                    queue.append(neighbor)
+        return None
+
+    def k_shortest_paths(self, source, target, k):
+        # Yen's algorithm, every hop costs the same so the spur paths are BFS.
+        first = self.shortest_path(source, target)
+        if first is None:
+            return []
+        paths, candidates = [first], []
+        while len(paths) < k:
+            previous = paths[-1]
+            for index in range(len(previous) - 1):
+                root = previous[:index + 1]
+                removed_edges = {
+                    (path[index], path[index + 1]) for path in paths if len(path) > index + 1 and path[:index + 1] == root
+                }
+                removed_edges |= {(b, a) for a, b in removed_edges}
+                spur = self.shortest_path(root[-1], target, frozenset(root[:-1]), removed_edges)
+                if spur is not None:
+                    candidate = root[:-1] + spur
+                    if candidate not in paths and candidate not in candidates:
+                        candidates.append(candidate)
+            if not candidates:
+                break
+            candidates.sort(key=len)
+            paths.append(candidates.pop(0))
+        return paths
+
+    def to_join_path(self, path):
+        tables, joins = [], []
+        for index, node in enumerate(path):
+            table = node if self.is_table[node] else self.owners.get(node)
+            if table is not None and self.ids[table] not in tables:
+                tables.append(self.ids[table])
+            if index and not self.is_table[node] and not self.is_table[path[index - 1]]:
+                joins.append((self.ids[path[index - 1]], self.ids[node]))
+        return JoinPath(tuple(tables), tuple(joins))
+
+    def find_join_paths(self, source_table, target_table, k=1):
+        source = self.tables_by_name.get(source_table.lower())
+        target = self.tables_by_name.get(target_table.lower())
+        if source is None or target is None:
+            raise KeyError(f"Unknown table: {source_table if source is None else target_table}")
+        return tuple(self.to_join_path(path) for path in self.k_shortest_paths(source, target, k))
+
+    def join_paths(self, source_table, target_table, k=3):
+        # Results are cached by table names, repeated questions from the text-to-SQL service are dict lookups.
+        return self.cached_join_paths(source_table, target_table, k)
+
+    def join_path(self, source_table, target_table):
+        paths = self.join_paths(source_table, target_table, 1)
+        return paths[0] if paths else None
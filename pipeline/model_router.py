@@ -0,0 +1,87 @@
+import re
+import threading
+from collections import defaultdict
+
+# (model name, highest complexity score it takes), the last tier takes every table above.
+DEFAULT_TIERS = (("gpt-4o-mini", 12), ("gpt-4o", None))
+
+
+def table_complexity(table, schema_context, input_tokens=0):
+    # What makes a table hard to get right: many columns, composite keys, foreign keys to infer from the column
+    # names, and long inputs (big DDL or related tables context, the prompt templates are the same for every table).
+    composite_foreign_keys = sum(len(foreign_key.columns) > 1 for foreign_key in table.foreign_keys)
+    return (
+        len(table.columns)
+        + 3 * (len(table.primary_key) > 1)
+        + 3 * composite_foreign_keys
+        + 2 * len(schema_context.implied_foreign_keys(table))
+        + input_tokens / 250
+    )
+
+
+def augmentation_issues(table, augmented_infos):
+    # The augmentation prompt mentions every column by name, the ones missing are what the extraction drops.
+    return [
+        column.name for column in table.columns
+        if not re.search(rf"(?<!\w){re.escape(column.name)}(?!\w)", augmented_infos, flags=re.I)
+    ]
+
+
+class ModelRouter:
+    # Sends each table to the cheapest model tier its complexity allows, and one tier up when the output fails
+    # the structural checks. Every call is recorded per stage and tier, to tune the thresholds.
+    def __init__(self, tiers=DEFAULT_TIERS, llms=None):
+        self.tiers = list(tiers)
+        # Model name -> chat model, the missing ones are created on first use.
+        self.llms = dict(llms or {})
+        self.lock = threading.Lock()
+        self.stats = defaultdict(lambda: defaultdict(float))
+
+    @property
+    def name(self):
+        # Part of the cache keys instead of a model name, outputs of another routing aren't reused.
+        return "router:" + ">".join(f"{model_name}@{limit}" for model_name, limit in self.tiers)
+
+    def model_name(self, tier):
+        return self.tiers[tier][0]
+
+    def llm(self, tier):
+        model_name = self.model_name(tier)
+        with self.lock:
+            if model_name not in self.llms:
+                from langchain_openai import ChatOpenAI
+                self.llms[model_name] = ChatOpenAI(temperature=0, model_name=model_name, max_retries=0)
+            return self.llms[model_name]
+
+    def route(self, score):
+        for tier, (_, limit) in enumerate(self.tiers):
+            if limit is None or score <= limit:
+                return tier
+        return len(self.tiers) - 1
+
+    def can_escalate(self, tier):
+        return tier + 1 < len(self.tiers)
+
+    def record(self, stage, tier, routed, passed, seconds, cost_usd):
+        with self.lock:
+            stats = self.stats[(stage, self.model_name(tier))]
+            stats["calls"] += 1
+            stats["routed"] += routed
+            stats["escalated_to"] += not routed
+            stats["passed"] += passed
+            stats["seconds"] += seconds
+            stats["cost_usd"] += cost_usd
+
+    def print_report(self):
+        columns = ["stage", "model", "calls", "routed", "escalated_to", "hit_rate", "avg_seconds", "cost_usd"]
+        rows = []
+        for (stage, model_name), stats in sorted(self.stats.items()):
+            rows.append([
+                stage, model_name, str(int(stats["calls"])), str(int(stats["routed"])), str(int(stats["escalated_to"])),
+                f"{stats['passed'] / stats['calls']:.2f}", f"{stats['seconds'] / stats['calls']:.2f}",
+                f"{stats['cost_usd']:.4f}",
+            ])
+        widths = [max([len(column)] + [len(row[index]) for row in rows]) for index, column in enumerate(columns)]
+        print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+        for row in rows:
+            print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
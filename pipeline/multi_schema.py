@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from pipeline.rate_limiter import RequestScheduler
+
+
+@dataclass
+class TenantSchema:
+    # One schema of a multi-schema build. The schema is DDL text, a path or parsed tables, or database_url is
+    # reflected in the worker. Without a database, the tenant's nodes are namespaced by label prefix.
+    name: str
+    schema: object = None
+    database_url: str = None
+    database: str = None
+    label_prefix: str = None
+    id_prefix: str = ""
+    options: dict = field(default_factory=dict)
+
+    @property
+    def namespace(self):
+        if self.label_prefix is not None:
+            return self.label_prefix
+        return "" if self.database else re.sub(r"\W", "_", self.name) + "_"
+
+
+def quota_share(total, processes, environment_variable, default):
+    # Every process has its own scheduler, each one gets an equal part of the account limits.
+    total = total or float(os.environ.get(environment_variable, default))
+    return total / processes
+
+
+def build_tenant(tenant, cache_root, requests_per_minute, tokens_per_minute, progress=None, llm_factory=None,
+                 writer_factory=None):
+    # Runs in a worker process: one DBToGraph build with the tenant's cache, namespace and progress events.
+    from graph_builder import DBToGraph
+    from pipeline.neo4j_writer import Neo4jBulkWriter
+
+    schema = tenant.schema
+    if tenant.database_url:
+        from pipeline.introspection import reflect_database
+        schema = reflect_database(tenant.database_url)
+
+    def hook(event):
+        if progress is not None and event.get("stage") == "write":
+            progress.put((tenant.name, "tables", event.get("tables", 1)))
+
+    if writer_factory is not None:
+        writer = writer_factory(tenant)
+    else:
+        writer = Neo4jBulkWriter(
+            database=tenant.database, include_source=True, label_prefix=tenant.namespace, id_prefix=tenant.id_prefix
+        )
+    try:
+        db_to_graph = DBToGraph(
+            schema, cache_dir=os.path.join(cache_root, tenant.name), writer=writer,
+            llm=llm_factory() if llm_factory is not None else None,
+            scheduler=RequestScheduler(requests_per_minute, tokens_per_minute), telemetry_hooks=[hook],
+            **tenant.options,
+        )
+        if progress is not None:
+            progress.put((tenant.name, "start", len(db_to_graph.tables)))
+        db_to_graph.create_kg()
+    finally:
+        writer.close()
+    manifest = db_to_graph.manifest.tables.values()
+    return {
+        "tenant": tenant.name,
+        "tables": len(db_to_graph.tables),
+        "nodes": sum(len(entry["nodes"]) for entry in manifest),
+        "relationships": sum(len(entry["relationships"]) for entry in manifest),
+        "cost_usd": round(sum(values["cost_usd"] for values in db_to_graph.telemetry.summary().values()), 6),
+    }
+
+
+class SchemaProgress:
+    # Tables written per tenant, from the events the worker processes send back.
+    def __init__(self, tenants, on_progress=None):
+        self.total = {tenant.name: None for tenant in tenants}
+        self.done = {tenant.name: 0 for tenant in tenants}
+        self.on_progress = on_progress or self.print_progress
+        self.started_at = time.perf_counter()
+
+    def update(self, tenant_name, kind, value):
+        if kind == "start":
+            self.total[tenant_name] = value
+        else:
+            self.done[tenant_name] += value
+        self.on_progress(tenant_name, self.done[tenant_name], self.total[tenant_name])
+
+    def print_progress(self, tenant_name, done, total):
+        finished = sum(1 for name, count in self.done.items() if self.total[name] and count >= self.total[name])
+        print(
+            f"[{time.perf_counter() - self.started_at:.1f}s] {tenant_name}: {done}/{total or '?'} tables, "
+            f"{finished}/{len(self.total)} schemas done"
+        )
+
+
+def build_schemas(tenants, cache_root="tenants", processes=None, requests_per_minute=None, tokens_per_minute=None,
+                  on_progress=None, llm_factory=None, writer_factory=None):
+    # Builds many schemas over a process pool, one schema per process at a time. The API limits are split
+    # between the processes, so together they use the whole quota. Returns the build summary of each tenant, or
+    # its error.
+    names = [tenant.name for tenant in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError("Tenant names must be unique, they name the cache directories and namespaces")
+    processes = min(processes or os.cpu_count(), len(tenants)) or 1
+    requests_per_minute = quota_share(requests_per_minute, processes, "OPENAI_RPM", 500)
+    tokens_per_minute = quota_share(tokens_per_minute, processes, "OPENAI_TPM", 30000)
+
+    progress = SchemaProgress(tenants, on_progress)
+    results = {}
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=processes) as executor:
+        queue = manager.Queue()
+        futures = {
+            executor.submit(
+                build_tenant, tenant, cache_root, requests_per_minute, tokens_per_minute, queue, llm_factory,
+                writer_factory,
+            ): tenant.name
+            for tenant in tenants
+        }
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            while not queue.empty():
+                progress.update(*queue.get())
+            for future in finished:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as error:
+                    # One failed schema doesn't stop the others.
+                    results[futures[future]] = {"tenant": futures[future], "error": repr(error)}
+    return [results[name] for name in names]
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def quote_name(name):
+    # Labels and relationship types can't be query parameters, so they are escaped into the query.
+    return "`" + name.replace("`", "``") + "`"
+
+
+def clean_property(value):
+    # Neo4j only stores primitives and lists of primitives.
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if isinstance(value, (list, tuple)):
+        return [json.dumps(item) if isinstance(item, (dict, list)) else item for item in value if item is not None]
+    return value
+
+
+def clean_properties(properties):
+    return {key: clean_property(value) for key, value in (properties or {}).items() if value is not None}
+
+
+def document_id(document):
+    return document.id or hashlib.md5(document.page_content.encode()).hexdigest()
+
+
+def schema_name(label, key):
+    # Constraint and index names are derived from the exact label: "TABLE" and "Table" are different labels, and
+    # sharing a name, IF NOT EXISTS would silently skip the second one.
+    return f"{label}_{key}_{hashlib.md5(label.encode()).hexdigest()[:8]}"
+
+
+def node_query(label):
+    return f"UNWIND $rows AS row MERGE (n:{quote_name(label)} {{id: row.id}}) SET n += row.properties"
+
+
+def relationship_query(source_label, relationship_type, target_label):
+    # Targets can belong to tables not written yet (foreign keys), MERGE creates them and they get
+    # their properties when their own table is written.
+    return (
+        f"UNWIND $rows AS row "
+        f"MERGE (s:{quote_name(source_label)} {{id: row.source}}) "
+        f"MERGE (t:{quote_name(target_label)} {{id: row.target}}) "
+        f"MERGE (s)-[r:{quote_name(relationship_type)}]->(t) SET r += row.properties"
+    )
+
+
+def document_query(document_label="Document"):
+    return (
+        f"UNWIND $rows AS row MERGE (d:{quote_name(document_label)} {{id: row.id}}) "
+        f"SET d.text = row.text, d += row.properties"
+    )
+
+
+def mentions_query(label, document_label="Document"):
+    return (
+        f"UNWIND $rows AS row MATCH (d:{quote_name(document_label)} {{id: row.document}}) "
+        f"MATCH (n:{quote_name(label)} {{id: row.node}}) MERGE (d)-[:MENTIONS]->(n)"
+    )
+
+
+def delete_nodes_query(label):
+    return f"UNWIND $rows AS row MATCH (n:{quote_name(label)} {{id: row}}) DETACH DELETE n"
+
+
+def delete_relationships_query(source_label, relationship_type, target_label):
+    return (
+        f"UNWIND $rows AS row "
+        f"MATCH (:{quote_name(source_label)} {{id: row.source}})-[r:{quote_name(relationship_type)}]->"
+        f"(:{quote_name(target_label)} {{id: row.target}}) DELETE r"
+    )
+
+
+def create_driver():
+    # Same environment variables Neo4jGraph reads.
+    from neo4j import GraphDatabase
+    return GraphDatabase.driver(
+        os.environ["NEO4J_URI"],
+        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"]),
+    )
+
+
+class Neo4jBulkWriter:
+    def __init__(self, driver=None, database=None, batch_size=DEFAULT_BATCH_SIZE, include_source=False,
+                 label_prefix="", id_prefix=""):
+        self.owns_driver = driver is None
+        self.driver = driver or create_driver()
+        self.database = database or os.environ.get("NEO4J_DATABASE")
+        self.batch_size = batch_size
+        self.include_source = include_source
+        # Namespace of the graph when several schemas share a database: "acme_" writes (:acme_TABLE) nodes, with
+        # their own constraints and indexes, and an id prefix keeps ids apart under shared labels. Graph documents
+        # and the build manifest keep the plain labels and ids, they are only mapped here.
+        self.label_prefix = label_prefix
+        self.id_prefix = id_prefix
+        self.session = None
+        self.constrained_labels = set()
+
+        # Rows waiting for the next flush, grouped so each group is one UNWIND query.
+        self.nodes = defaultdict(dict)
+        self.relationships = defaultdict(dict)
+        self.documents = {}
+        self.mentions = defaultdict(list)
+
+        self.rows_written = 0
+        self.write_seconds = 0.0
+
+    def get_session(self):
+        # One session for the whole build, its connection comes from the driver pool.
+        if self.session is None:
+            self.session = self.driver.session(database=self.database)
+        return self.session
+
+    def label(self, label):
+        return self.label_prefix + label
+
+    def node_id(self, node_id):
+        return self.id_prefix + node_id
+
+    def setup(self, labels=("TABLE", "COLUMN")):
+        # labels are the table and column labels the build writes, "Table" and "Column" for extracted graphs.
+        for label in labels:
+            self.ensure_constraint(self.label(label))
+        session = self.get_session()
+        for label, key in zip(labels, ("table_name", "column_name")):
+            label = self.label(label)
+            session.run(
+                f"CREATE INDEX {quote_name(schema_name(label, key))} IF NOT EXISTS FOR (n:{quote_name(label)}) ON (n.{key})"
+            ).consume()
+
+    def ensure_constraint(self, label):
+        # The uniqueness constraint also gives MERGE an index on id, without it every MERGE scans the label.
+        if label in self.constrained_labels:
+            return
+        self.get_session().run(
+            f"CREATE CONSTRAINT {quote_name(schema_name(label, 'id'))} IF NOT EXISTS "
+            f"FOR (n:{quote_name(label)}) REQUIRE n.id IS UNIQUE"
+        ).consume()
+        self.constrained_labels.add(label)
+
+    def pending_rows(self):
+        return (
+            sum(len(rows) for rows in self.nodes.values())
+            + sum(len(rows) for rows in self.relationships.values())
+            + len(self.documents)
+        )
+
+    def add_rows(self, graph_documents):
+        for graph_document in graph_documents:
+            for node in graph_document.nodes:
+                # Nodes repeated across documents are merged here, later properties win.
+                node_id = self.node_id(node.id)
+                row = self.nodes[self.label(node.type)].setdefault(node_id, {"id": node_id, "properties": {}})
+                row["properties"].update(clean_properties(node.properties))
+            for relationship in graph_document.relationships:
+                group = (self.label(relationship.source.type), relationship.type, self.label(relationship.target.type))
+                source, target = self.node_id(relationship.source.id), self.node_id(relationship.target.id)
+                self.relationships[group][(source, target)] = {
+                    "source": source,
+                    "target": target,
+                    "properties": clean_properties(relationship.properties),
+                }
+            if self.include_source and graph_document.source is not None:
+                source_id = self.node_id(document_id(graph_document.source))
+                self.documents[source_id] = {
+                    "id": source_id,
+                    "text": graph_document.source.page_content,
+                    "properties": clean_properties(graph_document.source.metadata),
+                }
+                for node in graph_document.nodes:
+                    self.mentions[self.label(node.type)].append({"document": source_id, "node": self.node_id(node.id)})
+
+    def write(self, graph_documents):
+        self.add_rows(graph_documents)
+        if self.pending_rows() >= self.batch_size:
+            self.flush()
+
+    def pending_queries(self):
+        # Nodes first, so relationships and mentions find them.
+        queries = [(node_query(label), list(rows.values())) for label, rows in self.nodes.items()]
+        queries += [
+            (relationship_query(*group), list(rows.values())) for group, rows in self.relationships.items()
+        ]
+        if self.documents:
+            document_label = self.label("Document")
+            queries.append((document_query(document_label), list(self.documents.values())))
+            queries += [(mentions_query(label, document_label), rows) for label, rows in self.mentions.items()]
+        return queries
+
+    def pending_labels(self):
+        labels = set(self.nodes)
+        for source_label, _, target_label in self.relationships:
+            labels.update((source_label, target_label))
+        if self.documents:
+            labels.add(self.label("Document"))
+        return labels
+
+    def clear(self):
+        self.nodes.clear()
+        self.relationships.clear()
+        self.documents.clear()
+        self.mentions.clear()
+
+    def run_batches(self, query, rows):
+        session = self.get_session()
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+            self.rows_written += len(batch)
+
+    def flush(self):
+        started_at = time.perf_counter()
+        for label in self.pending_labels():
+            self.ensure_constraint(label)
+        for query, rows in self.pending_queries():
+            self.run_batches(query, rows)
+        self.clear()
+        self.write_seconds += time.perf_counter() - started_at
+
+    def replace_table(self, table_name, graph_documents, stale_nodes=(), stale_relationships=()):
+        # Upserts a table's graph and deletes what it doesn't have anymore, all in one transaction,
+        # so readers never see a table half updated.
+        self.flush()
+        started_at = time.perf_counter()
+        self.add_rows(graph_documents)
+        for label in self.pending_labels() | {self.label(label) for label, _ in stale_nodes}:
+            self.ensure_constraint(label)
+        queries = self.table_delete_queries(table_name, stale_nodes, stale_relationships, self.include_source)
+        queries += self.pending_queries()
+        self.clear()
+
+        def replace(tx):
+            for query, rows in queries:
+                tx.run(query, rows=rows, table_name=table_name).consume()
+
+        self.get_session().execute_write(replace)
+        self.rows_written += sum(len(rows) for _, rows in queries)
+        self.write_seconds += time.perf_counter() - started_at
+
+    def delete_table(self, table_name, nodes):
+        self.replace_table(table_name, [], stale_nodes=nodes)
+
+    def table_delete_queries(self, table_name, stale_nodes, stale_relationships, delete_source):
+        queries = []
+        relationships = defaultdict(list)
+        for source_label, source_id, relationship_type, target_label, target_id in stale_relationships:
+            relationships[(self.label(source_label), relationship_type, self.label(target_label))].append(
+                {"source": self.node_id(source_id), "target": self.node_id(target_id)}
+            )
+        queries += [(delete_relationships_query(*group), rows) for group, rows in relationships.items()]
+
+        nodes = defaultdict(list)
+        for label, node_id in stale_nodes:
+            nodes[self.label(label)].append(self.node_id(node_id))
+        queries += [(delete_nodes_query(label), rows) for label, rows in nodes.items()]
+
+        if delete_source:
+            # The table's source document is written again with the new chunk.
+            queries.append((
+                f"MATCH (d:{quote_name(self.label('Document'))} {{table_name: $table_name}}) DETACH DELETE d", []
+            ))
+        return queries
+
+    @property
+    def rows_per_second(self):
+        return self.rows_written / self.write_seconds if self.write_seconds else 0.0
+
+    def report(self):
+        print(f"Neo4j: wrote {self.rows_written} rows in {self.write_seconds:.2f}s ({self.rows_per_second:.0f} rows/s)")
+
+    def close(self):
+        self.flush()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        if self.owns_driver:
+            self.driver.close()
@@ -0,0 +1,57 @@
+from langchain_community.graphs.graph_document import GraphDocument
+
+from pipeline.schema_diff import owns_node
+from pipeline.tokens import estimate_tokens
+
+# The extraction prompt already reads its input as chunks separated by this line.
+CHUNK_SEPARATOR = "---chunk---"
+
+# The answer has every node of every table of the pack, it has to fit in the completion limit too.
+DEFAULT_MAX_TABLES_PER_PACK = 8
+
+
+def join_chunks(chunks):
+    # A single chunk stays as it is, so unpacked prompts don't change.
+    if len(chunks) == 1:
+        return chunks[0].page_content
+    return "\n".join(f"{CHUNK_SEPARATOR}\n{chunk.page_content}" for chunk in chunks) + f"\n{CHUNK_SEPARATOR}"
+
+
+def pack_chunks(chunks, max_tokens, max_tables=DEFAULT_MAX_TABLES_PER_PACK):
+    # Greedy, in the chunks order: a pack is closed when the next chunk would go over the token budget or the
+    # table limit. A chunk larger than the budget gets a pack of its own.
+    packs, pack, pack_tokens = [], [], 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk.page_content)
+        if pack and (pack_tokens + tokens > max_tokens or len(pack) >= max_tables):
+            packs.append(pack)
+            pack, pack_tokens = [], 0
+        pack.append(chunk)
+        pack_tokens += tokens
+    if pack:
+        packs.append(pack)
+    return packs
+
+
+def split_pack(chunks, graph_documents):
+    # Maps what the LLM answered for a pack back to one graph document per table, by node id ("table" and
+    # "table.column"). Relationships go with their source node. Nodes no table of the pack owns, like foreign
+    # key targets, go with the first table.
+    table_names = [chunk.metadata["table_name"] for chunk in chunks]
+    # Longest names first, "geo.river" is a schema qualified table before "geo" is a table with a "river" column.
+    by_length = sorted(table_names, key=len, reverse=True)
+
+    def owner(node_id):
+        return next((name for name in by_length if owns_node(name, node_id)), table_names[0])
+
+    nodes = {name: [] for name in table_names}
+    relationships = {name: [] for name in table_names}
+    for graph_document in graph_documents:
+        for node in graph_document.nodes:
+            nodes[owner(node.id)].append(node)
+        for relationship in graph_document.relationships:
+            relationships[owner(relationship.source.id)].append(relationship)
+    return [
+        GraphDocument(nodes=nodes[name], relationships=relationships[name], source=chunk)
+        for name, chunk in zip(table_names, chunks)
+    ]
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+
+from pipeline.tokens import estimate_tokens
+
+
+@lru_cache(maxsize=None)
+def retryable_errors():
+    # openai is imported on the first call, commands that never call the LLM don't pay for it.
+    try:
+        import openai
+    except ImportError:
+        return TimeoutError, asyncio.TimeoutError
+    return (
+        openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError,
+        TimeoutError, asyncio.TimeoutError,
+    )
+
+# Completion tokens reserved per call before the real count is known.
+EXPECTED_COMPLETION_TOKENS = {
+    "augmentation": 300, "semantics": 400, "extraction": 1500, "compact_extraction": 400, "repair": 200,
+}
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        # Takes the amount right away, possibly going into debt, and returns how long the caller has to
+        # wait until the debt is refilled. Callers queue up in reservation order without polling.
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.level -= min(amount, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+
+def retry_after(error):
+    # 429 answers say how long to wait, that beats any guess.
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+class RequestScheduler:
+    # Shared by every LLM call of a build: requests and tokens per minute buckets in front of the calls,
+    # and jittered exponential backoff on 429s, timeouts and connection errors.
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_retries=6, base_delay=1.0,
+                 max_delay=60.0):
+        requests_per_minute = requests_per_minute or int(os.environ.get("OPENAI_RPM", 500))
+        tokens_per_minute = tokens_per_minute or int(os.environ.get("OPENAI_TPM", 30000))
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def estimate(self, prompt_text, stage):
+        return estimate_tokens(prompt_text) + EXPECTED_COMPLETION_TOKENS.get(stage, 500)
+
+    def reserve(self, estimated_tokens):
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def backoff(self, attempt, error):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return max(random.uniform(delay / 2, delay), retry_after(error))
+
+    def call(self, function, estimated_tokens, on_retry=None):
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.reserve(estimated_tokens))
+            try:
+                return function()
+            except retryable_errors() as error:
+                if attempt == self.max_retries:
+                    raise
+                if on_retry:
+                    on_retry(error)
+                time.sleep(self.backoff(attempt, error))
+
+    async def acall(self, function, estimated_tokens, on_retry=None):
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.reserve(estimated_tokens))
+            try:
+                return await function()
+            except retryable_errors() as error:
+                if attempt == self.max_retries:
+                    raise
+                if on_retry:
+                    on_retry(error)
+                await asyncio.sleep(self.backoff(attempt, error))
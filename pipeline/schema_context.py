@@ -0,0 +1,127 @@
+import math
+import re
+from collections import defaultdict
+from itertools import zip_longest
+
+from pipeline.tokens import estimate_tokens
+
+DEFAULT_MAX_CONTEXT_TOKENS = 1500
+
+
+def name_variants(name):
+    # "Country1", "country_id", "countries" -> "country"
+    name = name.lower().rsplit(".", 1)[-1]
+    variants = {name, re.sub(r"\d+$", "", name)}
+    for variant in list(variants):
+        variants.add(re.sub(r"_?(id|code|key|fk)$", "", variant))
+    for variant in list(variants):
+        if variant.endswith("ies"):
+            variants.add(variant[:-3] + "y")
+        elif variant.endswith("es"):
+            variants.add(variant[:-2])
+        if variant.endswith("s"):
+            variants.add(variant[:-1])
+    return {variant for variant in variants if variant}
+
+
+def summarize_table(table):
+    line = f"{table.name}({', '.join(column.name for column in table.columns)})"
+    return line + (f" PRIMARY KEY ({', '.join(table.primary_key)})" if table.primary_key else "")
+
+
+class SchemaContextIndex:
+    def __init__(self, tables, max_tokens=DEFAULT_MAX_CONTEXT_TOKENS):
+        self.max_tokens = max_tokens
+        # Unqualified name variants, "sales.customers" is found as "customers" or "customer_id".
+        self.tables_by_name = {}
+        # Full names, schema qualifier included.
+        self.tables_by_full_name = {}
+        self.tables_by_column = defaultdict(set)
+        self.tables_by_key_column = defaultdict(set)
+
+        for table in tables:
+            self.tables_by_full_name[table.name.lower()] = table
+            for variant in name_variants(table.name):
+                self.tables_by_name.setdefault(variant, table)
+            for column in table.columns:
+                for variant in name_variants(column.name):
+                    self.tables_by_column[variant].add(table.name)
+            for column_name in table.primary_key:
+                self.tables_by_key_column[column_name.lower()].add(table.name)
+        self.tables_count = max(len(tables), 1)
+
+    def table_named(self, name, schema=None):
+        # A referenced table: its full name, or an unqualified one, in the referencing table's schema first.
+        name = name.lower()
+        if "." not in name and schema:
+            name_in_schema = self.tables_by_full_name.get(f"{schema.lower()}.{name}")
+            if name_in_schema:
+                return name_in_schema
+        return self.tables_by_full_name.get(name) or self.tables_by_name.get(name)
+
+    def candidate_tables(self, table):
+        scores = defaultdict(float)
+        schema = table.name.rpartition(".")[0]
+        for foreign_key in table.foreign_keys:
+            referenced = self.table_named(foreign_key.referenced_table, schema)
+            if referenced:
+                scores[referenced.name] += 10
+
+        for column in table.columns:
+            # Columns named after a table, like "Country" -> country.
+            for variant in name_variants(column.name):
+                referenced = self.tables_by_name.get(variant)
+                if referenced:
+                    scores[referenced.name] += 5
+            # Columns shared with other tables' keys, rare names weigh more than "Name" or "Id".
+            sharing_tables = self.tables_by_key_column.get(column.name.lower(), ())
+            for other_name in sharing_tables:
+                scores[other_name] += math.log(self.tables_count / len(sharing_tables) + 1)
+
+        # Tables with columns named after this one reference it back.
+        for variant in name_variants(table.name):
+            for other_name in self.tables_by_column.get(variant, ()):
+                scores[other_name] += 1
+
+        scores.pop(table.name, None)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.tables_by_full_name[name.lower()] for name, _ in ranked]
+
+    def implied_foreign_keys(self, table):
+        # Columns named after another table without a declared foreign key, the ones the LLM has to infer.
+        declared = {column_name.lower() for foreign_key in table.foreign_keys for column_name in foreign_key.columns}
+        implied = []
+        for column in table.columns:
+            if column.name.lower() in declared:
+                continue
+            referenced = (self.tables_by_name.get(variant) for variant in name_variants(column.name))
+            if any(other is not None and other.name != table.name for other in referenced):
+                implied.append(column.name)
+        return implied
+
+    def context(self, table, compact=False):
+        return self.pack_context([table], compact)
+
+    def pack_candidate_tables(self, tables):
+        # Takes the candidates of each table in turn, so every table of a pack gets its best ones in first.
+        # The pack's own tables are left out, their chunks are in the prompt already.
+        seen = {table.name for table in tables}
+        rankings = [self.candidate_tables(table) for table in tables]
+        for candidates in zip_longest(*rankings):
+            for candidate in candidates:
+                if candidate is not None and candidate.name not in seen:
+                    seen.add(candidate.name)
+                    yield candidate
+
+    def pack_context(self, tables, compact=False):
+        # Adds the best candidates first until the token budget runs out, tables whose full DDL
+        # doesn't fit anymore are still listed with their one line summary if that fits.
+        parts, used_tokens = [], 0
+        for candidate in self.pack_candidate_tables(tables):
+            for text in ([summarize_table(candidate)] if compact else [candidate.ddl, summarize_table(candidate)]):
+                tokens = estimate_tokens(text)
+                if used_tokens + tokens <= self.max_tokens:
+                    parts.append(text)
+                    used_tokens += tokens
+                    break
+        return "\n".join(parts)
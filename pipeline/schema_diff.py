@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+
+from pipeline.augmentation_cache import atomic_write, normalize_ddl
+
+
+def table_fingerprint(table):
+    return hashlib.sha256(normalize_ddl(table.ddl).encode()).hexdigest()
+
+
+def column_signatures(table):
+    primary_key = {name.lower() for name in table.primary_key}
+    return {
+        column.name: f"{column.data_type}|nullable={column.is_nullable}|pk={column.name.lower() in primary_key}"
+                     f"|unique={column.is_unique}|default={column.default}"
+        for column in table.columns
+    }
+
+
+def owns_node(table_name, node_id):
+    # A table owns its own node and its "table.column" nodes, foreign key targets belong to other tables.
+    table_name, node_id = table_name.lower(), node_id.lower()
+    return node_id == table_name or node_id.startswith(table_name + ".")
+
+
+def graph_entries(table_name, graph_documents):
+    nodes, relationships = set(), set()
+    for graph_document in graph_documents:
+        for node in graph_document.nodes:
+            if owns_node(table_name, node.id):
+                nodes.add((node.type, node.id))
+        for relationship in graph_document.relationships:
+            if owns_node(table_name, relationship.source.id):
+                relationships.add((
+                    relationship.source.type, relationship.source.id, relationship.type,
+                    relationship.target.type, relationship.target.id,
+                ))
+    return nodes, relationships
+
+
+@dataclass
+class TableDiff:
+    added_columns: list = field(default_factory=list)
+    removed_columns: list = field(default_factory=list)
+    changed_columns: list = field(default_factory=list)
+
+
+@dataclass
+class SchemaDiff:
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    changed: dict = field(default_factory=dict)
+    unchanged: list = field(default_factory=list)
+
+    def summary(self):
+        return (
+            f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed, "
+            f"{len(self.unchanged)} unchanged tables"
+        )
+
+
+class BuildManifest:
+    def __init__(self, path, tables=None):
+        self.path = path
+        # table name -> fingerprint, column signatures and the graph entries written for it.
+        self.tables = tables or {}
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r") as file:
+            return cls(path, json.load(file)["tables"])
+
+    def save(self):
+        atomic_write(self.path, json.dumps({"tables": self.tables}, indent=1))
+
+    def record(self, table, graph_documents):
+        nodes, relationships = graph_entries(table.name, graph_documents)
+        self.tables[table.name] = {
+            "fingerprint": table_fingerprint(table),
+            "columns": column_signatures(table),
+            "nodes": sorted(nodes),
+            "relationships": sorted(relationships),
+        }
+
+    def stale_entries(self, table_name, graph_documents):
+        # What the last build wrote for this table and the new graph documents don't have anymore.
+        previous = self.tables.get(table_name, {})
+        nodes, relationships = graph_entries(table_name, graph_documents)
+        stale_nodes = {tuple(node) for node in previous.get("nodes", [])} - nodes
+        stale_relationships = {tuple(relationship) for relationship in previous.get("relationships", [])} - relationships
+        return sorted(stale_nodes), sorted(stale_relationships)
+
+    def diff(self, tables):
+        schema_diff = SchemaDiff()
+        current_names = {table.name for table in tables}
+        schema_diff.removed = sorted(name for name in self.tables if name not in current_names)
+
+        for table in tables:
+            previous = self.tables.get(table.name)
+            if previous is None:
+                schema_diff.added.append(table.name)
+            elif previous["fingerprint"] == table_fingerprint(table):
+                schema_diff.unchanged.append(table.name)
+            else:
+                old_columns, new_columns = previous["columns"], column_signatures(table)
+                schema_diff.changed[table.name] = TableDiff(
+                    added_columns=[name for name in new_columns if name not in old_columns],
+                    removed_columns=[name for name in old_columns if name not in new_columns],
+                    changed_columns=[
+                        name for name in new_columns
+                        if name in old_columns and old_columns[name] != new_columns[name]
+                    ],
+                )
+        return schema_diff
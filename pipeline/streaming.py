@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+from pipeline.augmentation_cache import split_schema_tables
+from pipeline.ddl_parser import TableDefinition, parse_create_table
+
+CREATE_TABLE_MARKER = "CREATE TABLE"
+READ_SIZE = 1 << 16
+
+# Put in a queue after the last item, every worker of the stage sees it.
+END = object()
+
+
+def read_chunks(source):
+    if isinstance(source, os.PathLike):
+        with open(source) as file:
+            yield from iter(lambda: file.read(READ_SIZE), "")
+    elif hasattr(source, "read"):
+        yield from iter(lambda: source.read(READ_SIZE), "")
+    else:
+        yield from source
+
+
+def iter_schema_tables(source):
+    # Yields the CREATE TABLE statements of a schema as they are read, the same units as split_schema_tables.
+    # The source is the schema text, a path, an open file or any iterable of text pieces (lines, chunks).
+    if isinstance(source, str):
+        yield from split_schema_tables(source)
+        return
+
+    buffer, scanned = "", 0
+    for chunk in read_chunks(source):
+        buffer += chunk
+        while True:
+            start = buffer.find(CREATE_TABLE_MARKER)
+            # A marker cut between two chunks shows up complete on the next one, only rescan the tail.
+            end = buffer.find(CREATE_TABLE_MARKER, max(start + 1, scanned - len(CREATE_TABLE_MARKER)))
+            if start < 0 or end < 0:
+                scanned = len(buffer)
+                break
+            yield from split_schema_tables(buffer[:end])
+            buffer, scanned = buffer[end:], 0
+    yield from split_schema_tables(buffer)
+
+
+def iter_tables(source):
+    # Already parsed tables, like the ones reflect_database gives, pass through, any other source is DDL.
+    if isinstance(source, (list, tuple)) and all(isinstance(table, TableDefinition) for table in source):
+        yield from source
+        return
+    for table_infos in iter_schema_tables(source):
+        yield parse_create_table(table_infos)
+
+
+async def feed(items, queue):
+    for item in items:
+        await queue.put(item)
+    await queue.put(END)
+
+
+async def run_stage(inputs, function, workers, outputs=None):
+    async def work():
+        while (item := await inputs.get()) is not END:
+            result = await function(item)
+            if outputs is not None:
+                await outputs.put(result)
+        # Put back for the other workers of the stage.
+        await inputs.put(END)
+
+    await asyncio.gather(*(work() for _ in range(workers)))
+    if outputs is not None:
+        await outputs.put(END)
+
+
+async def run_pipeline(items, stages, queue_size):
+    # Runs the items through the stages, a list of (async function, workers), linked by bounded queues.
+    # A slow stage fills its input queue and stops the ones before it, so only about queue_size items per
+    # stage are in memory at any time, whatever the number of items.
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    tasks = [asyncio.create_task(feed(items, queues[0]))]
+    for index, (function, workers) in enumerate(stages):
+        outputs = queues[index + 1] if index + 1 < len(stages) else None
+        tasks.append(asyncio.create_task(run_stage(queues[index], function, workers, outputs)))
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,79 @@
+import json
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+
+def index_tables(tables):
+    return {table.name.lower(): table for table in tables}
+
+
+def resolve_column_id(tables_by_name, target):
+    # "Country.code" -> "country.Code", None when the column doesn't exist in the schema.
+    if not isinstance(target, str):
+        return None
+    table_name, _, column_name = target.strip().rpartition(".")
+    table = tables_by_name.get(table_name.lower())
+    column = table.column(column_name) if table else None
+    return f"{table.name}.{column.name}" if column else None
+
+
+def foreign_key_targets(table, tables_by_name, semantics):
+    targets = {}
+    # Declared foreign keys are trusted as they are, inferred ones only fill the gaps.
+    for foreign_key in table.foreign_keys:
+        referenced_table = tables_by_name.get(foreign_key.referenced_table.lower())
+        referenced_columns = foreign_key.referenced_columns or (referenced_table.primary_key if referenced_table else [])
+        for column_name, referenced_column in zip(foreign_key.columns, referenced_columns):
+            column = table.column(column_name)
+            target = resolve_column_id(tables_by_name, f"{foreign_key.referenced_table}.{referenced_column}")
+            if column and target:
+                targets[column.name] = target
+
+    for column_name, target in (semantics.get("foreign_keys") or {}).items():
+        column = table.column(column_name)
+        target = resolve_column_id(tables_by_name, target)
+        if column and target and column.name not in targets and target != f"{table.name}.{column.name}":
+            targets[column.name] = target
+    return targets
+
+
+def table_to_graph_document(table, tables_by_name, semantics=None):
+    semantics = semantics or {}
+    column_descriptions = {
+        name.lower(): description for name, description in (semantics.get("column_descriptions") or {}).items()
+    }
+    foreign_keys = foreign_key_targets(table, tables_by_name, semantics)
+    primary_key = {name.lower() for name in table.primary_key}
+
+    table_node = Node(id=table.name, type="TABLE", properties={
+        "table_name": table.name,
+        "columns": [column.name for column in table.columns],
+        "primary_key": table.primary_key,
+        "foreign_keys": [json.dumps({column: target}) for column, target in foreign_keys.items()],
+        "table_description": semantics.get("table_description") or table.comment or "",
+        "unique_keys": [", ".join(unique_key) for unique_key in table.unique_keys],
+        "check_constraints": table.check_constraints,
+    })
+    nodes, relationships = [table_node], []
+    for column in table.columns:
+        column_node = Node(id=f"{table.name}.{column.name}", type="COLUMN", properties={
+            "column_name": column.name,
+            "data_type": column.data_type,
+            "is_nullable": column.is_nullable,
+            "is_primary_key": column.name.lower() in primary_key,
+            "is_foreign_key": column.name in foreign_keys,
+            "column_description": column_descriptions.get(column.name.lower()) or column.comment or "",
+        })
+        nodes.append(column_node)
+        relationships.append(Relationship(source=column_node, target=table_node, type="IS_COLUMN_OF"))
+
+    for column_name, target in foreign_keys.items():
+        relationships.append(Relationship(
+            source=Node(id=f"{table.name}.{column_name}", type="COLUMN"),
+            target=Node(id=target, type="COLUMN"),
+            type="FOREIGN_KEY_OF",
+        ))
+
+    source = Document(page_content=table.ddl, metadata={"table_name": table.name})
+    return GraphDocument(nodes=nodes, relationships=relationships, source=source)
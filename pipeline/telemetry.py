@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# USD per 1M prompt / completion tokens.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+}
+
+# Batch API jobs are billed at half the real-time price.
+BATCH_PRICE_FACTOR = 0.5
+
+
+def model_prices(model_name):
+    # Providers answer with dated names like "gpt-4o-2024-08-06", the longest known prefix wins.
+    matches = [name for name in MODEL_PRICES if (model_name or "").startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else (0.0, 0.0)
+
+
+def estimate_cost(model_name, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = model_prices(model_name)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    # Attached to a single LLM call through its config, collects what the provider reports.
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.model_name = None
+        self.started_at = time.perf_counter()
+
+    def on_llm_end(self, response, **kwargs):
+        llm_output = response.llm_output or {}
+        self.model_name = llm_output.get("model_name") or self.model_name
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.prompt_tokens += usage.get("input_tokens", 0)
+                    self.completion_tokens += usage.get("output_tokens", 0)
+                    return
+        token_usage = llm_output.get("token_usage") or {}
+        self.prompt_tokens += token_usage.get("prompt_tokens", 0)
+        self.completion_tokens += token_usage.get("completion_tokens", 0)
+
+    def on_retry(self, retry_state, **kwargs):
+        self.retries += 1
+
+    @property
+    def config(self):
+        return {"callbacks": [self]}
+
+
+class JSONLEventSink:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.lock, open(self.path, "a") as file:
+            file.write(json.dumps(event) + "\n")
+
+
+class BuildTelemetry:
+    # Every stage of every table becomes an event dict, sent to each hook as soon as it is emitted.
+    def __init__(self, model_name, hooks=()):
+        self.model_name = model_name
+        self.hooks = list(hooks)
+        self.events = []
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def emit(self, event):
+        event = {"timestamp": time.time(), **event}
+        with self.lock:
+            self.events.append(event)
+        for hook in self.hooks:
+            hook(event)
+
+    def cache_hit(self, stage, table_name):
+        self.emit({"stage": stage, "table": table_name, "cached": True, "seconds": 0.0})
+
+    def batch_result(self, stage, table_name, prompt_tokens, completion_tokens):
+        self.emit({
+            "stage": stage, "table": table_name, "status": "ok", "batch": True, "seconds": 0.0,
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "cost_usd": round(estimate_cost(self.model_name, prompt_tokens, completion_tokens) * BATCH_PRICE_FACTOR, 6),
+            "model_name": self.model_name,
+        })
+
+    @contextmanager
+    def llm_call(self, stage, table_name, model_name=None):
+        # Yields the callback, its config goes to the chain and token usage and retries come back through it.
+        # model_name is the model the call goes to, when it isn't the build's.
+        callback = TokenUsageCallback()
+        status = "error"
+        try:
+            yield callback
+            status = "ok"
+        finally:
+            model_name = callback.model_name or model_name or self.model_name
+            self.emit({
+                "stage": stage,
+                "table": table_name,
+                "status": status,
+                "seconds": round(time.perf_counter() - callback.started_at, 4),
+                "retries": callback.retries,
+                "prompt_tokens": callback.prompt_tokens,
+                "completion_tokens": callback.completion_tokens,
+                "cost_usd": round(estimate_cost(model_name, callback.prompt_tokens, callback.completion_tokens), 6),
+                "model_name": model_name,
+            })
+
+    @contextmanager
+    def timed(self, stage, table_name=None, **fields):
+        started_at = time.perf_counter()
+        status = "error"
+        try:
+            yield
+            status = "ok"
+        finally:
+            self.emit({
+                "stage": stage, "table": table_name, "status": status,
+                "seconds": round(time.perf_counter() - started_at, 4), **fields,
+            })
+
+    def summary(self):
+        stages = defaultdict(lambda: defaultdict(float))
+        for event in self.events:
+            stage = stages[event["stage"]]
+            stage["cached" if event.get("cached") else "calls"] += 1
+            stage["errors"] += event.get("status") == "error"
+            for key in ("seconds", "retries", "prompt_tokens", "completion_tokens", "cost_usd"):
+                stage[key] += event.get(key, 0)
+        return stages
+
+    def slowest_tables(self, count=5):
+        seconds = defaultdict(float)
+        for event in self.events:
+            if event.get("table"):
+                seconds[event["table"]] += event["seconds"]
+        return sorted(seconds.items(), key=lambda item: -item[1])[:count]
+
+    def print_summary(self):
+        columns = ["stage", "calls", "cached", "errors", "retries", "seconds", "prompt_tokens", "completion_tokens", "cost_usd"]
+        rows = [
+            [stage] + [f"{values[column]:.2f}" if column in ("seconds", "cost_usd") else str(int(values[column]))
+                       for column in columns[1:]]
+            for stage, values in self.summary().items()
+        ]
+        widths = [max([len(column)] + [len(row[index]) for row in rows]) for index, column in enumerate(columns)]
+        print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+        for row in rows:
+            print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+        slowest = ", ".join(f"{table} ({seconds:.2f}s)" for table, seconds in self.slowest_tables())
+        print("Slowest tables:", slowest or "-")
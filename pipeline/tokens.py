@@ -0,0 +1,8 @@
+# Around 4 characters per token for English and SQL. A fixed rule rather than the model's tokenizer: the estimates
+# decide which related tables fit in the context and where packs end, so they are part of the cache keys and must
+# give the same numbers on every machine (tiktoken downloads its encodings on first use, or falls back when offline).
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
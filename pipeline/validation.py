@@ -0,0 +1,160 @@
+import json
+import os
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass
+
+from pipeline.augmentation_cache import atomic_write
+from pipeline.schema_diff import owns_node
+from pipeline.structural_graph import resolve_column_id, table_to_graph_document
+
+
+@dataclass
+class ValidationIssue:
+    # missing_table, missing_column, unknown_column, wrong_type, primary_key or foreign_key_target.
+    kind: str
+    node_id: str
+    detail: str = ""
+
+    def __str__(self):
+        return f"{self.kind} {self.node_id}" + (f": {self.detail}" if self.detail else "")
+
+
+def normalize_type(data_type):
+    return re.sub(r"\s+", "", str(data_type or "")).upper()
+
+
+def is_true(value):
+    # The LLM gives properties back as strings.
+    return value is True or str(value).strip().lower() in ("true", "yes", "1")
+
+
+def extracted_nodes(graph_document):
+    # The transformer title-cases the ids, "country.Code" comes back as "Country.Code".
+    return {node.id.lower(): node for node in graph_document.nodes}
+
+
+def extracted_foreign_keys(table, graph_document):
+    # (column, target id) of the FOREIGN_KEY_OF edges going out of the table's columns.
+    return [
+        (relationship.source.id.rpartition(".")[2], relationship.target.id)
+        for relationship in graph_document.relationships
+        if relationship.type == "FOREIGN_KEY_OF" and owns_node(table.name, relationship.source.id)
+    ]
+
+
+def validate_graph_document(table, tables_by_name, graph_document):
+    # Checks an extracted graph document against the parsed DDL of its table.
+    issues = []
+    nodes = extracted_nodes(graph_document)
+    table_node = nodes.get(table.name.lower())
+    if table_node is None or table_node.type.upper() != "TABLE":
+        issues.append(ValidationIssue("missing_table", table.name))
+
+    primary_key = {name.lower() for name in table.primary_key}
+    column_ids = set()
+    for column in table.columns:
+        column_id = f"{table.name}.{column.name}"
+        column_ids.add(column_id.lower())
+        node = nodes.get(column_id.lower())
+        if node is None:
+            issues.append(ValidationIssue("missing_column", column_id))
+            continue
+        data_type = node.properties.get("data_type")
+        if normalize_type(data_type) != normalize_type(column.data_type):
+            issues.append(ValidationIssue("wrong_type", column_id, f"{data_type} instead of {column.data_type}"))
+        if is_true(node.properties.get("is_primary_key")) != (column.name.lower() in primary_key):
+            issues.append(ValidationIssue("primary_key", column_id, f"should be {column.name.lower() in primary_key}"))
+
+    for node_id, node in nodes.items():
+        if node_id != table.name.lower() and owns_node(table.name, node_id) and node_id not in column_ids:
+            issues.append(ValidationIssue("unknown_column", node.id))
+
+    for column_name, target in extracted_foreign_keys(table, graph_document):
+        if table.column(column_name) and resolve_column_id(tables_by_name, target) is None:
+            issues.append(ValidationIssue("foreign_key_target", f"{table.name}.{column_name}", f"{target} doesn't exist"))
+    return issues
+
+
+def extracted_semantics(table, graph_document):
+    # What the LLM got right and the DDL can't tell: descriptions and foreign keys, in the semantics format
+    # table_to_graph_document takes. Foreign keys to missing columns are dropped there.
+    nodes = extracted_nodes(graph_document)
+    table_node = nodes.get(table.name.lower())
+    column_descriptions = {}
+    for column in table.columns:
+        node = nodes.get(f"{table.name}.{column.name}".lower())
+        if node is not None and node.properties.get("column_description"):
+            column_descriptions[column.name] = node.properties["column_description"]
+    return {
+        "table_description": table_node.properties.get("table_description") if table_node is not None else None,
+        "column_descriptions": column_descriptions,
+        "foreign_keys": {
+            column_name: target for column_name, target in extracted_foreign_keys(table, graph_document)
+            if table.column(column_name)
+        },
+    }
+
+
+def repair_request(table, issues, semantics):
+    # The parts of the failed nodes only the LLM can give back, None when the DDL fixes everything (wrong types,
+    # primary keys, made up columns).
+    lines = []
+    if any(issue.kind == "missing_table" for issue in issues) and not semantics["table_description"]:
+        lines.append("- Describe the table.")
+    undescribed = [
+        column.name for column in table.columns
+        if column.name not in semantics["column_descriptions"]
+        and any(issue.kind == "missing_column" and issue.node_id == f"{table.name}.{column.name}" for issue in issues)
+    ]
+    if undescribed:
+        lines.append(f"- Describe the columns: {', '.join(undescribed)}.")
+    broken = sorted({issue.node_id.rpartition(".")[2] for issue in issues if issue.kind == "foreign_key_target"})
+    if broken:
+        lines.append(f"- Give the foreign key targets of the columns: {', '.join(broken)}.")
+    return "\n".join(lines) or None
+
+
+def repair_graph_document(table, tables_by_name, graph_document, semantics, repair_semantics=None):
+    # Tables and columns are rebuilt from the DDL, with the descriptions and valid foreign keys of the
+    # extraction, completed by the answer of the repair prompt.
+    repair_semantics = repair_semantics or {}
+    merged = {
+        "table_description": semantics["table_description"] or repair_semantics.get("table_description"),
+        "column_descriptions": {**(repair_semantics.get("column_descriptions") or {}), **semantics["column_descriptions"]},
+        "foreign_keys": {**semantics["foreign_keys"], **(repair_semantics.get("foreign_keys") or {})},
+    }
+    repaired = table_to_graph_document(table, tables_by_name, merged)
+    repaired.source = graph_document.source
+    return repaired
+
+
+class QualityReport:
+    # Issues found in the extraction of each table, and whether they were repaired, saved after every build.
+    def __init__(self, path, tables=None):
+        self.path = path
+        self.tables = tables or {}
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r") as file:
+            return cls(path, json.load(file)["tables"])
+
+    def save(self):
+        atomic_write(self.path, json.dumps({"tables": self.tables}, indent=1))
+
+    def record(self, table_name, issues, llm_repair=False, remaining=()):
+        self.tables[table_name] = {
+            "issues": [asdict(issue) for issue in issues],
+            "llm_repair": llm_repair,
+            "remaining": [asdict(issue) for issue in remaining],
+        }
+
+    def summary(self):
+        kinds = Counter(issue["kind"] for entry in self.tables.values() for issue in entry["issues"])
+        failed = sum(bool(entry["issues"]) for entry in self.tables.values())
+        remaining = sum(bool(entry["remaining"]) for entry in self.tables.values())
+        issues = ", ".join(f"{count} {kind}" for kind, count in kinds.most_common()) or "no issues"
+        return f"{failed} of {len(self.tables)} tables repaired ({issues}), {remaining} with remaining issues"
@@ -0,0 +1,51 @@
+from prompts.lazy_prompt import LazyChatPrompt
+
+# Part of the graph document store key, bump it whenever the prompt or the tool below change.
+COMPACT_GRAPH_PROMPT_VERSION = "db_to_graphs_compact_v0"
+
+# The graph comes back as one strict function call with a row per column, instead of every node and property
+# written out by name, and is decoded locally (see pipeline/compact_graph.py).
+COMPACT_GRAPH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "database_tables",
+        "description": "The tables of the input chunk, with one positional row per column.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "tables": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "table": {"type": "string"},
+                            "description": {"type": "string"},
+                            # [column, data type, flags, references, description]
+                            "columns": {"type": "array", "items": {"type": "array", "items": {"type": "string"}}},
+                        },
+                        "required": ["table", "description", "columns"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["tables"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+COMPACT_GRAPH_PROMPT = LazyChatPrompt([
+    ("system", """
+You extract the structure of database tables for a knowledge graph. Call `database_tables` with one entry for each table of the `### Input Chunk` section: its name exactly as in the chunk, a one sentence description, and its columns in schema order.
+
+Every column is one row of five strings, in this order:
+1. The column name, exactly as in the schema.
+2. The data type as written in the schema, with its size, e.g. `VARCHAR(20)`.
+3. The flags: `P` if the column is part of the primary key, `N` if it is nullable, `PN` for both, empty for neither.
+4. The `table.column` the column references if it is a foreign key, empty otherwise. The target must exist in the chunk or in the `### Related Tables` section.
+5. A short description of the column.
+
+Don't add columns or tables that aren't in the chunk, the related tables are only there for the references.
+"""),
+    ("human", "{input}"),
+])
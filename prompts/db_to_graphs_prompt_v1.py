@@ -1,7 +1,7 @@
-from langchain_core.prompts import SystemMessagePromptTemplate, PromptTemplate, ChatPromptTemplate, HumanMessagePromptTemplate
+from prompts.lazy_prompt import LazyChatPrompt
 from schemas.mondial_schema import MONDIAL_SCHEMA
 
-DB_GRAPH_STRUCTURE = SystemMessagePromptTemplate.from_template("""
+DB_GRAPH_STRUCTURE = """
 # Knowledge Graph Construction Instructions for Database Tables
 
 ## 1. Overview
@@ -109,10 +109,9 @@ The table Country represents countries and their key attributes. Its primary key
 
 ## Task
 Based on the descriptive chunks provided, construct the knowledge graph with nodes and relationships using the format above. Ensure all foreign keys and their referenced tables are explicitly captured.
-""")
+"""
 
-DB_GRAPH_STRUCTURE_TIP = HumanMessagePromptTemplate(
-    prompt=PromptTemplate.from_template("""
+DB_GRAPH_STRUCTURE_TIP = """
 Ensure you extract all relevant information from each chunk and strictly adhere to the format and rules provided above. Focus on:
 1. Identifying TABLE nodes with all attributes (`table_name`, `columns`, `primary_key`, etc.).
 2. Identifying COLUMN nodes with their attributes (`column_name`, `data_type`, etc.).
@@ -124,7 +123,6 @@ You can get information from schema below to construct the Foreign Keys or other
 
 Based on the input chunk below, construct the graph:
 {input}
-""")
-)
+"""
 
-DB_GRAPH_PROMPT = ChatPromptTemplate.from_messages([DB_GRAPH_STRUCTURE, DB_GRAPH_STRUCTURE_TIP])
+DB_GRAPH_PROMPT = LazyChatPrompt([("system", DB_GRAPH_STRUCTURE), ("human", DB_GRAPH_STRUCTURE_TIP)])
@@ -0,0 +1,23 @@
+from prompts.lazy_prompt import LazyChatPrompt
+from prompts.db_to_graphs_prompt_v1 import DB_GRAPH_STRUCTURE
+
+# Part of the graph document store key, bump it whenever the prompt below changes.
+DB_GRAPH_PROMPT_VERSION = "db_to_graphs_prompt_v2"
+
+# Same instructions as v1, but the schema context comes with each input instead of the full schema.
+DB_GRAPH_STRUCTURE_TIP = """
+Ensure you extract all relevant information from each chunk and strictly adhere to the format and rules provided above. Focus on:
+1. Identifying TABLE nodes with all attributes (`table_name`, `columns`, `primary_key`, etc.).
+2. Identifying COLUMN nodes with their attributes (`column_name`, `data_type`, etc.).
+3. Creating appropriate relationships (`HAS_COLUMN`, `FOREIGN_KEY_TO`).
+Use consistent node and relationship naming conventions. 
+
+The input below has a `### Related Tables` section with the schema of the tables the chunk may reference, use it to construct the Foreign Keys or other relations between tables. Construct the graph only for the `### Input Chunk` section:
+{input}
+"""
+
+DB_GRAPH_PROMPT = LazyChatPrompt([("system", DB_GRAPH_STRUCTURE), ("human", DB_GRAPH_STRUCTURE_TIP)])
+
+
+def format_graph_input(chunk, related_tables):
+    return f"### Related Tables\n{related_tables}\n\n### Input Chunk\n{chunk}"
@@ -0,0 +1,34 @@
+from prompts.lazy_prompt import LazyChatPrompt
+
+# Bump it whenever the prompt below changes.
+GRAPH_REPAIR_PROMPT_VERSION = "graph_repair_v0"
+
+# The structure of a failed table is rebuilt from its DDL, the LLM is only asked for what the DDL can't tell.
+GRAPH_REPAIR_PROMPT = LazyChatPrompt([("human", """
+A graph of a database table was extracted with some parts missing or wrong. The table structure (columns, data types, primary keys) has already been fixed from the DDL, only the parts listed under `### Repair` are left.
+
+### Rules
+1. Write a one sentence description for the table, only if the repair asks for it.
+2. Write a short description for every listed column, using the column name exactly as in the schema.
+3. For every listed foreign key column, give the column it references as `table.column`. The target must exist in the table itself or in the related tables below. Leave the column out if it doesn't reference anything.
+4. Answer only with a JSON object, without any text around it, and don't add keys for parts that were not asked.
+
+### Output Format
+{{
+  "table_description": "<description>",
+  "column_descriptions": {{"<column>": "<description>"}},
+  "foreign_keys": {{"<column>": "<table>.<column>"}}
+}}
+
+### Related Tables
+{schema_tables}
+
+### Table
+{table_infos}
+
+### Issues Found
+{issues}
+
+### Repair
+{repair}
+""")])
@@ -0,0 +1,18 @@
+from functools import cached_property
+
+
+class LazyChatPrompt:
+    # A ChatPromptTemplate built on first use: importing langchain_core.prompts takes most of a second, and the
+    # commands that only read the caches (status, dry-run) estimate the prompt tokens from the text instead.
+    def __init__(self, messages):
+        # (role, template) pairs, like ChatPromptTemplate.from_messages takes.
+        self.messages = messages
+
+    @cached_property
+    def template(self):
+        from langchain_core.prompts import ChatPromptTemplate
+        return ChatPromptTemplate.from_messages(self.messages)
+
+    def text(self, **inputs):
+        # The formatted messages, without the role prefixes ChatPromptTemplate.format adds.
+        return "\n".join(template.format(**inputs) for _, template in self.messages)
@@ -1,6 +1,9 @@
-from langchain_core.prompts import ChatPromptTemplate
+from prompts.lazy_prompt import LazyChatPrompt
 
-DATA_AUGMENTATION_PROMPT = ChatPromptTemplate.from_template("""
+# Part of the augmentation cache key, bump it whenever the prompt below changes.
+DATA_AUGMENTATION_PROMPT_VERSION = "table_data_augmentation_v0"
+
+DATA_AUGMENTATION_PROMPT = LazyChatPrompt([("human", """
 Your task is to transform database schema definitions into a concise, descriptive story in English. The goal is to describe the structure of the table and its columns in a way that conveys key technical details while remaining simple and easy to follow. Focus on creating an explanation that can be used to generate knowledge graph nodes and relationships, **explicitly detailing any foreign keys and their connections to other tables. Foreign keys must be identified explicitly, even if only implied by the schema**.
 
 ### Rules
@@ -38,4 +41,4 @@ The table Geo_Sea stores data about seas and their geographical locations. Its p
 ### Task
 Based on the following input, transform it into a concise story format as described above, making sure to explicitly identify all foreign keys and their relationships, even when implied by column names:
 {input_schema}
-""")
+""")])
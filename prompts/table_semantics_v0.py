@@ -0,0 +1,46 @@
+from prompts.lazy_prompt import LazyChatPrompt
+
+# Part of the semantics cache key, bump it whenever the prompt below changes.
+TABLE_SEMANTICS_PROMPT_VERSION = "table_semantics_v0"
+
+TABLE_SEMANTICS_PROMPT = LazyChatPrompt([("human", """
+Your task is to describe a database table and infer its foreign keys. The table structure (columns, data types, primary keys and constraints) is already known, so do not repeat it. Only provide the parts that need judgment.
+
+### Rules
+1. Write a one sentence description of the table's purpose.
+2. Write a short description for every column, using the column name exactly as in the schema.
+3. List the foreign keys of the table, declared or implied by the column names (e.g., "Country" likely referencing the "country" table). Each target must be written as `table.column` and must exist in the table itself or in the related tables below.
+4. Answer only with a JSON object, without any text around it.
+
+### Output Format
+{{
+  "table_description": "<description>",
+  "column_descriptions": {{"<column>": "<description>"}},
+  "foreign_keys": {{"<column>": "<table>.<column>"}}
+}}
+
+### Example Input
+CREATE TABLE geo_river
+(River VARCHAR(35),
+ Country VARCHAR(4),
+ Province VARCHAR(35),
+ CONSTRAINT GRiverKey PRIMARY KEY (Province, Country, River));
+
+### Example Output
+{{
+  "table_description": "Links rivers to the countries and provinces they flow through.",
+  "column_descriptions": {{
+    "River": "Name of the river.",
+    "Country": "Code of the country the river flows through.",
+    "Province": "Name of the province the river flows through."
+  }},
+  "foreign_keys": {{"River": "river.Name", "Country": "country.Code", "Province": "province.Name"}}
+}}
+
+### Related Tables
+{schema_tables}
+
+### Task
+Describe the following table:
+{table_infos}
+""")])
@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from pipeline.build_jobs import BuildService
+
+
+class BuildRequest(BaseModel):
+    # DDL text, or a SQLAlchemy URL to reflect the schema from.
+    ddl: Optional[str] = None
+    database_url: Optional[str] = None
+    db_schemas: Optional[list] = None
+    extraction_mode: str = "llm"
+    max_concurrency: int = 8
+    pack_max_tokens: Optional[int] = None
+    # Builds again even if the same schema was already built.
+    force: bool = False
+
+
+def create_app(build_service=None):
+    build_service = build_service or BuildService(
+        workers=int(os.environ.get("SERVICE_WORKERS", 4)),
+        cache_root=os.environ.get("SERVICE_CACHE_ROOT", "service_cache"),
+    )
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await build_service.start()
+        try:
+            yield
+        finally:
+            await build_service.stop()
+
+    app = FastAPI(title="db-to-graphs", lifespan=lifespan)
+    app.state.build_service = build_service
+
+    def get_job(job_id):
+        job = build_service.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        return job
+
+    @app.post("/jobs", status_code=202)
+    async def submit_job(build_request: BuildRequest):
+        if bool(build_request.ddl) == bool(build_request.database_url):
+            raise HTTPException(status_code=422, detail="Give either ddl or database_url")
+        schema = build_request.ddl
+        if build_request.database_url:
+            from pipeline.introspection import reflect_database
+            schema = await asyncio.to_thread(reflect_database, build_request.database_url, build_request.db_schemas)
+        job = await build_service.submit(
+            schema, force=build_request.force, extraction_mode=build_request.extraction_mode,
+            max_concurrency=build_request.max_concurrency, pack_max_tokens=build_request.pack_max_tokens,
+        )
+        return job.to_dict()
+
+    @app.get("/jobs")
+    async def list_jobs():
+        return [job.to_dict() for job in build_service.jobs.values()]
+
+    @app.get("/jobs/{job_id}")
+    async def read_job(job_id: str):
+        return get_job(job_id).to_dict()
+
+    @app.get("/jobs/{job_id}/events")
+    async def stream_job_events(job_id: str, request: Request):
+        # Server-sent events: the telemetry of the build (per table and stage) and the job state changes.
+        job = get_job(job_id)
+
+        async def events():
+            async for event in job.stream():
+                if await request.is_disconnected():
+                    return
+                yield f"data: {json.dumps(event)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Schema to graph build service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
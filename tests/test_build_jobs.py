@@ -0,0 +1,89 @@
+import asyncio
+
+from pipeline.neo4j_writer import Neo4jBulkWriter
+
+from benchmarks.fakes import CannedResponder, FakeChatModel, InMemoryGraphStore
+from pipeline.build_jobs import BuildJob, BuildService, job_key, schema_hash
+from pipeline.ddl_parser import parse_schema
+from pipeline.rate_limiter import RequestScheduler
+from schemas.mondial_schema import MONDIAL_SCHEMA
+
+
+async def run_job(tmp_path, **options):
+    llm = FakeChatModel(responder=CannedResponder(parse_schema(MONDIAL_SCHEMA)))
+    stores = []
+
+    def writer_factory(job):
+        stores.append(InMemoryGraphStore())
+        return stores[-1]
+
+    service = BuildService(
+        llm=llm, cache_root=str(tmp_path), scheduler=RequestScheduler(10**9, 10**12), writer_factory=writer_factory,
+    )
+    await service.start()
+    try:
+        job = await service.submit(MONDIAL_SCHEMA, max_concurrency=4, **options)
+        async for _ in job.stream():
+            pass
+    finally:
+        await service.stop()
+    return job, llm.counters, stores[0]
+
+
+def test_service_jobs_stream_one_table_per_extraction(tmp_path):
+    job, counters, store = asyncio.run(run_job(tmp_path))
+    assert job.state == "done", job.error
+    assert counters["extraction"]["calls"] == counters["augmentation"]["calls"] == job.result["tables"] == 33
+
+
+def test_jobs_are_keyed_on_what_they_write_and_caches_on_the_schema(tmp_path):
+    async def run():
+        llm = FakeChatModel(responder=CannedResponder(parse_schema(MONDIAL_SCHEMA)))
+        service = BuildService(
+            llm=llm, cache_root=str(tmp_path), scheduler=RequestScheduler(10**9, 10**12),
+            writer_factory=lambda job: InMemoryGraphStore(),
+        )
+        await service.start()
+        try:
+            first = await service.submit(MONDIAL_SCHEMA, max_concurrency=4)
+            async for _ in first.stream():
+                pass
+            # The concurrency doesn't change the graph, the first job comes back.
+            assert await service.submit(MONDIAL_SCHEMA, max_concurrency=2) is first
+            compact = await service.submit(MONDIAL_SCHEMA, max_concurrency=4, extraction_mode="compact")
+            async for _ in compact.stream():
+                pass
+        finally:
+            await service.stop()
+        return first, compact, llm.counters
+
+    first, compact, counters = asyncio.run(run())
+    assert compact is not first and compact.state == "done", compact.error
+    assert compact.schema_key == first.schema_key
+    assert compact.namespace != first.namespace
+    assert first.result["namespace"] == first.namespace
+    # The compact build replays the augmentation cache of the first one.
+    assert counters["augmentation"]["calls"] == 33
+    assert counters["extraction"]["calls"] == 66
+
+
+def test_service_jobs_pack_the_extraction_with_pack_max_tokens(tmp_path):
+    job, counters, store = asyncio.run(run_job(tmp_path, pack_max_tokens=4000))
+    assert job.state == "done", job.error
+    assert counters["augmentation"]["calls"] == 33
+    assert counters["extraction"]["calls"] < 33
+    # Every table is still written and recorded on its own.
+    assert job.result["nodes"] == 170
+    assert sum(node_type == "Table" for node_type, _ in store.nodes) == 33
+
+
+def test_jobs_write_into_their_own_namespace():
+    service = BuildService(driver=object())
+    jobs = [BuildJob(job_key(schema_hash(parse_schema(schema)), {}), None, [], {}) for schema in (
+        "CREATE TABLE Country (Code CHAR(4) PRIMARY KEY);",
+        "CREATE TABLE Country (Code CHAR(4) PRIMARY KEY, Name TEXT);",
+    )]
+    writers = [service.create_writer(job) for job in jobs]
+    assert all(isinstance(writer, Neo4jBulkWriter) for writer in writers)
+    assert [writer.label("Table") for writer in writers] == [f"{job.namespace}Table" for job in jobs]
+    assert jobs[0].namespace != jobs[1].namespace
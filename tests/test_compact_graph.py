@@ -0,0 +1,65 @@
+import json
+
+from langchain_core.documents import Document
+
+from pipeline.compact_graph import decode_column_row, decode_compact_graph
+
+
+def chunk(table_name):
+    return Document(page_content=f"The table {table_name}.", metadata={"table_name": table_name})
+
+
+def test_column_rows_are_padded_and_trimmed():
+    assert decode_column_row(["Name", "VARCHAR(35)"]) == {
+        "column_name": "Name", "data_type": "VARCHAR(35)", "flags": "", "references": "", "column_description": "",
+    }
+    assert decode_column_row(["Id", "INT", "PN", "", "The key.", "extra"])["column_description"] == "The key."
+    assert decode_column_row(None)["column_name"] == ""
+
+
+def test_compact_answer_gives_the_transformer_nodes():
+    output = {"tables": [{
+        "table": "city", "description": "Cities.",
+        "columns": [
+            ["Name", "VARCHAR(35)", "PN", "", "The name."],
+            ["Country", "CHAR(4)", "N", "country.Code", "The country."],
+            ["", "INT"],
+        ],
+    }]}
+    [graph_document] = decode_compact_graph(output, [chunk("city")])
+
+    assert [(node.type, node.id) for node in graph_document.nodes] == [
+        ("Table", "City"), ("Column", "City.Name"), ("Column", "City.Country"),
+    ]
+    table, name, country = graph_document.nodes
+    assert table.properties["primary_key"] == ["Name"]
+    assert table.properties["foreign_keys"] == [json.dumps({"Country": "country.Code"})]
+    assert name.properties["is_primary_key"] and name.properties["is_nullable"]
+    assert country.properties["is_foreign_key"] and not country.properties["is_primary_key"]
+    assert [(r.source.id, r.type, r.target.type, r.target.id) for r in graph_document.relationships] == [
+        ("City.Name", "IS_COLUMN_OF", "Table", "City"),
+        ("City.Country", "IS_COLUMN_OF", "Table", "City"),
+        ("City.Country", "FOREIGN_KEY_OF", "Column", "Country.Code"),
+    ]
+    assert graph_document.source.metadata["table_name"] == "city"
+
+
+def test_pack_answers_are_matched_by_table_name():
+    chunks = [chunk("city"), chunk("river"), chunk("lake")]
+    output = {"tables": [
+        {"table": "RIVER", "description": "", "columns": [["Name", "TEXT", "P", "", ""]]},
+        {"table": "city", "description": "", "columns": [["Name", "TEXT", "P", "", ""]]},
+    ]}
+    city, river, lake = decode_compact_graph(output, chunks)
+
+    assert [node.id for node in city.nodes] == ["City", "City.Name"]
+    assert [node.id for node in river.nodes] == ["River", "River.Name"]
+    # A table missing from the answer gets an empty document, validation repairs it.
+    assert lake.nodes == [] and lake.source is chunks[2]
+    assert [document.nodes for document in decode_compact_graph(None, chunks[:1])] == [[]]
+
+
+def test_the_only_table_of_a_one_table_pack_takes_any_name():
+    output = {"tables": [{"table": "Cities", "description": "", "columns": [["Name", "TEXT", "", "", ""]]}]}
+    [graph_document] = decode_compact_graph(output, [chunk("city")])
+    assert [node.id for node in graph_document.nodes] == ["City", "City.Name"]
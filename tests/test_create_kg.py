@@ -0,0 +1,33 @@
+import asyncio
+
+from benchmarks.fakes import CannedResponder, FakeChatModel, InMemoryGraphStore
+from graph_builder import DBToGraph
+from pipeline.ddl_parser import parse_schema
+from pipeline.rate_limiter import RequestScheduler
+from schemas.mondial_schema import MONDIAL_SCHEMA
+
+
+class LoopBoundChatModel(FakeChatModel):
+    # Like the OpenAI async client, its connections belong to the first event loop it ran on.
+    loop: object = None
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        if loop is not self.loop:
+            raise RuntimeError("Event loop is closed")
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+def test_concurrent_cold_build_runs_in_one_event_loop(tmp_path):
+    llm = LoopBoundChatModel(responder=CannedResponder(parse_schema(MONDIAL_SCHEMA)))
+    store = InMemoryGraphStore()
+    db_to_graph = DBToGraph(
+        MONDIAL_SCHEMA, max_concurrency=8, cache_dir=str(tmp_path), llm=llm, writer=store,
+        scheduler=RequestScheduler(10**9, 10**12),
+    )
+    db_to_graph.create_kg()
+
+    assert llm.counters["augmentation"]["calls"] == llm.counters["extraction"]["calls"] == 33
+    assert sum(node_type == "Table" for node_type, _ in store.nodes) == 33
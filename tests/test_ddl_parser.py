@@ -0,0 +1,69 @@
+import pytest
+
+from pipeline.ddl_parser import parse_create_table, parse_schema, render_ddl, strip_comments
+
+
+def test_columns_keys_and_constraints():
+    table = parse_create_table("""
+    CREATE TABLE "geo"."City" (
+        Name VARCHAR (35) NOT NULL,
+        Country CHAR(4) REFERENCES country (Code),
+        Population INT CHECK (Population >= 0),
+        CONSTRAINT CityKey PRIMARY KEY (Name, Country),
+        CONSTRAINT CityPop CHECK (Population < 1e10),
+        UNIQUE (Name)
+    );""")
+
+    assert table.name == "geo.City"
+    assert [(column.name, column.data_type) for column in table.columns] == [
+        ("Name", "VARCHAR(35)"), ("Country", "CHAR(4)"), ("Population", "INT"),
+    ]
+    assert table.primary_key == ["Name", "Country"]
+    assert not table.column("country").is_nullable
+    assert table.unique_keys == [["Name"]]
+    assert table.check_constraints == ["Population >= 0", "CityPop: Population < 1e10"]
+    assert [(fk.columns, fk.referenced_table, fk.referenced_columns) for fk in table.foreign_keys] == [
+        (["Country"], "country", ["Code"]),
+    ]
+
+
+def test_comment_markers_inside_strings_are_kept():
+    ddl = """CREATE TABLE notes (
+        id INT PRIMARY KEY, -- the key
+        body VARCHAR(20) DEFAULT 'x -- y' /* a default */,
+        tag VARCHAR(5) COMMENT 'a /* b */ c'
+    );"""
+    assert "the key" not in strip_comments(ddl)
+    table = parse_create_table(ddl)
+
+    assert [column.name for column in table.columns] == ["id", "body", "tag"]
+    assert table.column("body").default == "'x -- y'"
+    assert table.column("tag").comment == "a /* b */ c"
+
+
+def test_escaped_quotes_in_strings():
+    table = parse_create_table("CREATE TABLE t (a VARCHAR(5) DEFAULT 'it''s -- fine', b INT);")
+    assert table.column("a").default == "'it''s -- fine'"
+    assert table.column("b").data_type == "INT"
+
+
+@pytest.mark.parametrize("ddl, message", [
+    ("CREATE TABLE x (a INT", "Unclosed ("),
+    ("CREATE TABLE x (a INT, b VARCHAR(5) DEFAULT 'open)", "Unclosed '"),
+    ("CREATE VIEW x AS SELECT 1", "Not a CREATE TABLE"),
+])
+def test_malformed_ddl_raises_a_clear_error(ddl, message):
+    with pytest.raises(ValueError, match=message.replace("(", r"\(")):
+        parse_create_table(ddl)
+
+
+def test_rendered_ddl_parses_back_to_the_same_table():
+    [table] = parse_schema("""
+    CREATE TABLE sales.orders (
+        id INT PRIMARY KEY,
+        "customer id" INT NOT NULL,
+        note VARCHAR(10) DEFAULT 'n/a' COMMENT 'free text',
+        CONSTRAINT positive CHECK (id > 0),
+        FOREIGN KEY ("customer id") REFERENCES sales.customers (id)
+    );""")
+    assert parse_create_table(render_ddl(table)).__dict__ | {"ddl": ""} == table.__dict__ | {"ddl": ""}
@@ -0,0 +1,52 @@
+from langchain_community.graphs.graph_document import GraphDocument, Node
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from pipeline.embedding_index import MIN_CAPACITY, EmbeddingIndex
+
+
+def described_columns(count, description="Stores a value."):
+    nodes = [Node(id="Big", type="Table", properties={"table_description": "A big table."})]
+    nodes += [
+        Node(id=f"Big.Column{index}", type="Column", properties={"column_description": f"{description} {index}"})
+        for index in range(count)
+    ]
+    return [GraphDocument(nodes=nodes, relationships=[], source=Document(page_content="", metadata={}))]
+
+
+def test_index_grows_past_its_initial_capacity(tmp_path):
+    index = EmbeddingIndex(str(tmp_path), embedder=DeterministicFakeEmbedding(size=8))
+    index.add_graph_documents(described_columns(MIN_CAPACITY + 100))
+    assert index.flush() == MIN_CAPACITY + 101
+    assert len(index) == MIN_CAPACITY + 101
+    assert len(index.vectors) >= MIN_CAPACITY + 101
+
+    reloaded = EmbeddingIndex(str(tmp_path), embedder=DeterministicFakeEmbedding(size=8))
+    assert len(reloaded) == MIN_CAPACITY + 101
+    # Stored rows survived the copy into the grown matrix.
+    assert reloaded.search("Big.Column3: Stores a value. 3", k=1)[0][0] == "Big.Column3"
+    assert reloaded.search("Big: A big table.", k=1, node_type="TABLE")[0][0] == "Big"
+
+
+def test_only_changed_descriptions_are_embedded_again(tmp_path):
+    index = EmbeddingIndex(str(tmp_path), embedder=DeterministicFakeEmbedding(size=8))
+    index.add_graph_documents(described_columns(10))
+    index.flush()
+
+    documents = described_columns(10)
+    documents[0].nodes[4].properties["column_description"] = "Changed."
+    index.add_graph_documents(documents)
+    assert index.flush() == 1
+
+
+def test_removed_rows_are_filled_from_the_last_one(tmp_path):
+    index = EmbeddingIndex(str(tmp_path), embedder=DeterministicFakeEmbedding(size=8))
+    index.add_graph_documents(described_columns(5))
+    index.flush()
+    last_vector = index.vectors[len(index) - 1].copy()
+
+    index.remove(["Big.Column0"])
+    assert len(index) == 5
+    assert "Big.Column0" not in index.rows
+    moved = index.rows[index.ids[1]]
+    assert (index.vectors[moved] == last_vector).all()
@@ -0,0 +1,57 @@
+import sqlite3
+
+from pipeline.ddl_parser import parse_create_table
+from pipeline.introspection import REFLECTION_BATCH_SIZE, reflect_database
+
+SHOP_DDL = """
+CREATE TABLE customers (
+    id INTEGER PRIMARY KEY,
+    email VARCHAR(80) NOT NULL,
+    country CHAR(2) DEFAULT 'FR',
+    -- SQLite only reflects table level unique constraints.
+    UNIQUE (email)
+);
+CREATE TABLE orders (
+    id INTEGER,
+    line INTEGER,
+    customer_id INTEGER NOT NULL REFERENCES customers (id),
+    total NUMERIC(10, 2),
+    CONSTRAINT positive_total CHECK (total >= 0),
+    PRIMARY KEY (id, line)
+);
+"""
+
+
+def sqlite_url(tmp_path, ddl):
+    path = tmp_path / "shop.db"
+    with sqlite3.connect(path) as connection:
+        connection.executescript(ddl)
+    return f"sqlite:///{path}"
+
+
+def test_reflected_keys_and_checks(tmp_path):
+    customers, orders = reflect_database(sqlite_url(tmp_path, SHOP_DDL))
+
+    assert [column.name for column in customers.columns] == ["id", "email", "country"]
+    assert customers.primary_key == ["id"]
+    assert customers.column("email").is_unique and not customers.column("email").is_nullable
+    assert customers.column("country").default == "'FR'"
+    assert orders.primary_key == ["id", "line"]
+    assert not orders.column("line").is_nullable
+    assert [(fk.columns, fk.referenced_table, fk.referenced_columns) for fk in orders.foreign_keys] == [
+        (["customer_id"], "customers", ["id"]),
+    ]
+    assert orders.check_constraints == ["positive_total: total >= 0"]
+    assert orders.column("total").data_type == "NUMERIC(10, 2)"
+
+
+def test_rendered_ddl_parses_back_to_the_reflected_table(tmp_path):
+    for table in reflect_database(sqlite_url(tmp_path, SHOP_DDL)):
+        parsed = parse_create_table(table.ddl)
+        assert parsed.__dict__ | {"ddl": ""} == table.__dict__ | {"ddl": ""}
+
+
+def test_tables_keep_their_order_across_batches(tmp_path):
+    names = [f"t{index:03d}" for index in range(REFLECTION_BATCH_SIZE + 5)]
+    ddl = "".join(f"CREATE TABLE {name} (id INTEGER PRIMARY KEY);" for name in names)
+    assert [table.name for table in reflect_database(sqlite_url(tmp_path, ddl), max_workers=4)] == names
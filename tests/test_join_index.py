@@ -0,0 +1,83 @@
+from benchmarks.fakes import CannedResponder, FakeChatModel, InMemoryGraphStore
+from graph_builder import DBToGraph
+from pipeline.ddl_parser import parse_schema
+from pipeline.join_index import JoinIndex
+from pipeline.rate_limiter import RequestScheduler
+
+SHOP_SCHEMA = """
+CREATE TABLE customers (id INT PRIMARY KEY, name VARCHAR(50));
+CREATE TABLE orders (id INT PRIMARY KEY, customer_id INT REFERENCES customers(id), total FLOAT);
+CREATE TABLE order_items (order_id INT REFERENCES orders(id), product VARCHAR(20), PRIMARY KEY (order_id, product));
+CREATE TABLE suppliers (id INT PRIMARY KEY);
+"""
+
+
+def build(tmp_path, extraction_mode):
+    db_to_graph = DBToGraph(
+        SHOP_SCHEMA, cache_dir=str(tmp_path), extraction_mode=extraction_mode,
+        llm=FakeChatModel(responder=CannedResponder(parse_schema(SHOP_SCHEMA))), writer=InMemoryGraphStore(),
+        scheduler=RequestScheduler(10**9, 10**12),
+    )
+    db_to_graph.create_kg()
+    return db_to_graph
+
+
+def test_join_index_from_an_llm_mode_manifest(tmp_path):
+    db_to_graph = build(tmp_path, "llm")
+    join_index = JoinIndex.load(db_to_graph.join_index_path)
+
+    assert len(join_index.tables_by_name) == 4
+    path = join_index.join_path("order_items", "customers")
+    assert [table.lower() for table in path.tables] == ["order_items", "orders", "customers"]
+    assert [(source.lower(), target.lower()) for source, target in path.joins] == [
+        ("order_items.order_id", "orders.id"), ("orders.customer_id", "customers.id"),
+    ]
+    assert join_index.join_path("suppliers", "orders") is None
+
+
+def test_join_index_from_a_structural_manifest(tmp_path):
+    join_index = JoinIndex.from_manifest(build(tmp_path, "structural").manifest)
+    assert join_index.join_path("order_items", "customers").tables == ("order_items", "orders", "customers")
+
+
+def test_k_shortest_paths_are_ordered_by_length():
+    nodes = [("TABLE", name) for name in ("a", "b", "c")]
+    relationships = [
+        ("COLUMN", "a.x", "IS_COLUMN_OF", "TABLE", "a"),
+        ("COLUMN", "b.x", "IS_COLUMN_OF", "TABLE", "b"),
+        ("COLUMN", "b.y", "IS_COLUMN_OF", "TABLE", "b"),
+        ("COLUMN", "c.y", "IS_COLUMN_OF", "TABLE", "c"),
+        ("COLUMN", "c.z", "IS_COLUMN_OF", "TABLE", "c"),
+        ("COLUMN", "a.z", "IS_COLUMN_OF", "TABLE", "a"),
+        ("COLUMN", "a.x", "FOREIGN_KEY_OF", "COLUMN", "b.x"),
+        ("COLUMN", "b.y", "FOREIGN_KEY_OF", "COLUMN", "c.y"),
+        ("COLUMN", "a.z", "FOREIGN_KEY_OF", "COLUMN", "c.z"),
+    ]
+    paths = JoinIndex(nodes, relationships).join_paths("a", "c", k=2)
+    assert [path.tables for path in paths] == [("a", "c"), ("a", "b", "c")]
+    assert paths[0].joins == (("a.z", "c.z"),)
+
+
+class FakeNeo4jGraph:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    def query(self, query, params=None):
+        self.params = params
+        return self.rows
+
+
+def test_join_index_from_a_namespaced_neo4j_graph():
+    graph = FakeNeo4jGraph([
+        {"source_type": "acme_Column", "source": "t1:Orders.Id", "type": "IS_COLUMN_OF", "target_type": "acme_Table",
+         "target": "t1:Orders"},
+        {"source_type": "acme_Column", "source": "t1:Items.Order_Id", "type": "IS_COLUMN_OF",
+         "target_type": "acme_Table", "target": "t1:Items"},
+        {"source_type": "acme_Column", "source": "t1:Items.Order_Id", "type": "FOREIGN_KEY_OF",
+         "target_type": "acme_Column", "target": "t1:Orders.Id"},
+    ])
+    join_index = JoinIndex.from_neo4j(graph, label_prefix="acme_", id_prefix="t1:")
+
+    assert graph.params == {"label_prefix": "acme_"}
+    assert join_index.join_path("items", "orders").joins == (("Items.Order_Id", "Orders.Id"),)
@@ -0,0 +1,59 @@
+from benchmarks.fakes import CannedResponder, FakeChatModel, InMemoryGraphStore
+from graph_builder import DBToGraph
+from pipeline.ddl_parser import parse_schema
+from pipeline.model_router import ModelRouter, table_complexity
+from pipeline.rate_limiter import RequestScheduler
+from pipeline.schema_context import SchemaContextIndex
+
+SHOP_SCHEMA = """
+CREATE TABLE customers (id INT PRIMARY KEY, name VARCHAR(50));
+CREATE TABLE orders (id INT PRIMARY KEY, customer_id INT REFERENCES customers(id), total FLOAT);
+CREATE TABLE order_items (order_id INT, product_id INT, quantity INT, PRIMARY KEY (order_id, product_id));
+"""
+
+
+def test_complexity_and_tier_thresholds():
+    tables = parse_schema(SHOP_SCHEMA)
+    schema_context = SchemaContextIndex(tables)
+    customers, orders, order_items = tables
+    assert table_complexity(customers, schema_context) == 2
+    assert table_complexity(orders, schema_context, input_tokens=500) == 5
+    # Composite primary key, and order_id names the orders table without a declared foreign key.
+    assert table_complexity(order_items, schema_context) == 3 + 3 + 2
+
+    router = ModelRouter((("small", 5), ("medium", 10), ("large", None)))
+    assert [router.route(score) for score in (0, 5, 5.1, 10, 10.5, 1000)] == [0, 0, 1, 1, 2, 2]
+    assert router.can_escalate(1) and not router.can_escalate(2)
+
+
+def test_failed_extraction_goes_one_tier_up(tmp_path):
+    canned = CannedResponder(parse_schema(SHOP_SCHEMA))
+
+    def sloppy(prompt, tool_name=None):
+        # The cheap model forgets a column of orders.
+        answer = canned(prompt, tool_name)
+        if tool_name and "The table orders " in prompt.split("### Input Chunk")[-1]:
+            answer["nodes"] = [node for node in answer["nodes"] if node["id"] != "orders.total"]
+        return answer
+
+    cheap = FakeChatModel(responder=sloppy, model_name="gpt-4o-mini")
+    strong = FakeChatModel(responder=canned, model_name="gpt-4o")
+    router = ModelRouter(llms={"gpt-4o-mini": cheap, "gpt-4o": strong})
+    store = InMemoryGraphStore()
+    db_to_graph = DBToGraph(
+        SHOP_SCHEMA, cache_dir=str(tmp_path), router=router, writer=store, scheduler=RequestScheduler(10**9, 10**12),
+    )
+    db_to_graph.create_kg()
+
+    assert cheap.counters["augmentation"]["calls"] == cheap.counters["extraction"]["calls"] == 3
+    assert strong.counters["extraction"]["calls"] == 1 and "augmentation" not in strong.counters
+    cheap_stats, strong_stats = router.stats[("extraction", "gpt-4o-mini")], router.stats[("extraction", "gpt-4o")]
+    assert dict(cheap_stats, seconds=0, cost_usd=0) == {
+        "calls": 3, "routed": 3, "escalated_to": 0, "passed": 2, "seconds": 0, "cost_usd": 0,
+    }
+    assert (strong_stats["calls"], strong_stats["routed"], strong_stats["escalated_to"], strong_stats["passed"]) == (
+        1, 0, 1, 1,
+    )
+    # The escalated answer passed, nothing was left to repair.
+    assert ("Column", "Orders.Total") in store.nodes
+    assert not db_to_graph.quality_report.tables.get("orders", {}).get("issues")
@@ -0,0 +1,24 @@
+import queue
+
+from benchmarks.fakes import CannedResponder, FakeChatModel, InMemoryGraphStore
+from pipeline.ddl_parser import parse_schema
+from pipeline.multi_schema import SchemaProgress, TenantSchema, build_tenant
+from schemas.mondial_schema import MONDIAL_SCHEMA
+
+
+def test_packed_tenant_progress_reaches_its_total(tmp_path):
+    tenant = TenantSchema("mondial", MONDIAL_SCHEMA, options={"pack_max_tokens": 4000})
+    progress = queue.Queue()
+    result = build_tenant(
+        tenant, str(tmp_path), 10**9, 10**12, progress,
+        llm_factory=lambda: FakeChatModel(responder=CannedResponder(parse_schema(MONDIAL_SCHEMA))),
+        writer_factory=lambda tenant: InMemoryGraphStore(),
+    )
+
+    updates = []
+    schema_progress = SchemaProgress([tenant], on_progress=lambda *update: updates.append(update))
+    while not progress.empty():
+        schema_progress.update(*progress.get())
+    # Fewer writes than tables, every pack counts all its tables.
+    assert len(updates) - 1 < result["tables"] == 33
+    assert updates[-1] == ("mondial", 33, 33)
@@ -0,0 +1,105 @@
+import re
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+from pipeline.neo4j_writer import Neo4jBulkWriter
+
+
+class FakeTransaction:
+    def __init__(self, queries):
+        self.queries = queries
+
+    def run(self, query, **params):
+        self.queries.append((query, params))
+        return self
+
+    def consume(self):
+        pass
+
+
+class FakeSession(FakeTransaction):
+    def execute_write(self, work):
+        return work(FakeTransaction(self.queries))
+
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    def __init__(self):
+        self.queries = []
+
+    def session(self, database=None):
+        return FakeSession(self.queries)
+
+    def close(self):
+        pass
+
+
+def schema_names(queries):
+    return [re.search(r"CREATE (?:CONSTRAINT|INDEX) `([^`]+)`", query).group(1) for query, _ in queries
+            if query.startswith("CREATE")]
+
+
+def graph_document():
+    table = Node(id="City", type="Table", properties={"table_name": "city"})
+    column = Node(id="City.Name", type="Column", properties={"column_name": "Name"})
+    return GraphDocument(
+        nodes=[table, column], relationships=[Relationship(source=column, target=table, type="IS_COLUMN_OF")],
+        source=Document(page_content="The table city.", metadata={"table_name": "city"}),
+    )
+
+
+def test_setup_and_flush_constrain_the_written_labels():
+    driver = FakeDriver()
+    writer = Neo4jBulkWriter(driver=driver)
+    writer.setup(("Table", "Column"))
+    writer.write([graph_document()])
+    writer.flush()
+
+    constraints = [query for query, _ in driver.queries if query.startswith("CREATE CONSTRAINT")]
+    assert len(constraints) == 2
+    assert {re.search(r"FOR \(n:`(\w+)`\)", query).group(1) for query in constraints} == {"Table", "Column"}
+    indexes = [query for query, _ in driver.queries if query.startswith("CREATE INDEX")]
+    assert any("`Table`) ON (n.table_name)" in query for query in indexes)
+    assert any("`Column`) ON (n.column_name)" in query for query in indexes)
+
+
+def test_labels_differing_in_case_get_their_own_constraints():
+    driver = FakeDriver()
+    writer = Neo4jBulkWriter(driver=driver, label_prefix="acme_")
+    writer.setup(("TABLE", "COLUMN"))
+    writer.setup(("Table", "Column"))
+
+    names = schema_names(driver.queries)
+    assert len(names) == len(set(names)) == 8
+    assert all(name.startswith("acme_") for name in names)
+
+
+def test_replace_table_deletes_stale_entries_before_writing_the_new_ones():
+    driver = FakeDriver()
+    writer = Neo4jBulkWriter(driver=driver, include_source=True, label_prefix="acme_", id_prefix="t1:")
+    writer.replace_table(
+        "city", [graph_document()], stale_nodes=[("Column", "City.Area")],
+        stale_relationships=[("Column", "City.Area", "IS_COLUMN_OF", "Table", "City")],
+    )
+    queries = [(query, params) for query, params in driver.queries if not query.startswith("CREATE")]
+
+    assert [query.split(") ")[-1] for query, _ in queries[:3]] == ["DELETE r", "DETACH DELETE n", "DETACH DELETE d"]
+    assert "(:`acme_Column` {id: row.source})-[r:`IS_COLUMN_OF`]->(:`acme_Table` {id: row.target})" in queries[0][0]
+    assert queries[0][1]["rows"] == [{"source": "t1:City.Area", "target": "t1:City"}]
+    assert "(n:`acme_Column` {id: row})" in queries[1][0] and queries[1][1]["rows"] == ["t1:City.Area"]
+    # The old source document goes, the new chunk is written again with the table's nodes.
+    assert "(d:`acme_Document` {table_name: $table_name})" in queries[2][0]
+    assert all("MERGE" in query for query, _ in queries[3:])
+
+
+def test_delete_table_removes_its_nodes():
+    driver = FakeDriver()
+    writer = Neo4jBulkWriter(driver=driver)
+    writer.delete_table("river", [("Table", "River"), ("Column", "River.Name")])
+
+    deletes = {re.search(r"\(n:`(\w+)`", query).group(1): params["rows"] for query, params in driver.queries
+               if "DETACH DELETE n" in query}
+    assert deletes == {"Table": ["River"], "Column": ["River.Name"]}
@@ -0,0 +1,49 @@
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+from pipeline.packing import CHUNK_SEPARATOR, join_chunks, pack_chunks, split_pack
+from pipeline.tokens import estimate_tokens
+
+
+def chunk(table_name, text=None):
+    return Document(page_content=text or f"The table {table_name}.", metadata={"table_name": table_name})
+
+
+def test_packs_close_on_the_token_budget_and_the_table_limit():
+    chunks = [chunk(name, "word " * 40) for name in "abcde"]
+    two_chunks = 2 * estimate_tokens(chunks[0].page_content)
+    assert [len(pack) for pack in pack_chunks(chunks, max_tokens=two_chunks)] == [2, 2, 1]
+    assert [len(pack) for pack in pack_chunks(chunks, max_tokens=10**6, max_tables=3)] == [3, 2]
+    # A chunk larger than the budget still gets a pack.
+    assert [len(pack) for pack in pack_chunks(chunks, max_tokens=1)] == [1] * 5
+
+
+def test_single_chunk_prompts_are_unchanged():
+    assert join_chunks([chunk("a")]) == "The table a."
+    assert join_chunks([chunk("a"), chunk("b")]).count(CHUNK_SEPARATOR) == 3
+
+
+def test_split_pack_gives_each_table_its_nodes():
+    chunks = [chunk("geo"), chunk("geo.river"), chunk("city")]
+    geo, river = Node(id="Geo", type="Table"), Node(id="Geo.River", type="Table")
+    geo_river = Node(id="Geo.River", type="Column")
+    river_name = Node(id="Geo.River.Name", type="Column")
+    city_river = Node(id="City.River", type="Column")
+    stranger = Node(id="Country.Code", type="Column")
+    answer = GraphDocument(
+        nodes=[geo, river, geo_river, river_name, city_river, stranger],
+        relationships=[
+            Relationship(source=river_name, target=river, type="IS_COLUMN_OF"),
+            Relationship(source=city_river, target=river_name, type="FOREIGN_KEY_OF"),
+        ],
+        source=Document(page_content="pack"),
+    )
+
+    geo_document, river_document, city_document = split_pack(chunks, [answer])
+    # "Geo.River" is the schema qualified table, its columns go with it, not with "geo".
+    assert [node.id for node in geo_document.nodes] == ["Geo", "Country.Code"]
+    assert [node.id for node in river_document.nodes] == ["Geo.River", "Geo.River", "Geo.River.Name"]
+    assert [node.id for node in city_document.nodes] == ["City.River"]
+    assert [relationship.type for relationship in river_document.relationships] == ["IS_COLUMN_OF"]
+    assert [relationship.type for relationship in city_document.relationships] == ["FOREIGN_KEY_OF"]
+    assert [document.source for document in (geo_document, river_document, city_document)] == chunks
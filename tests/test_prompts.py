@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+import pytest
+
+from prompts.db_to_graphs_compact_v0 import COMPACT_GRAPH_PROMPT
+from prompts.db_to_graphs_prompt_v2 import DB_GRAPH_PROMPT
+from prompts.graph_repair_v0 import GRAPH_REPAIR_PROMPT
+from prompts.table_data_augmentation_v0 import DATA_AUGMENTATION_PROMPT
+from prompts.table_semantics_v0 import TABLE_SEMANTICS_PROMPT
+
+INPUTS = {"input": "{chunk}", "input_schema": "DDL", "table_infos": "T", "schema_tables": "S", "issues": "I", "repair": "R"}
+
+
+@pytest.mark.parametrize("prompt", [
+    COMPACT_GRAPH_PROMPT, DB_GRAPH_PROMPT, GRAPH_REPAIR_PROMPT, DATA_AUGMENTATION_PROMPT, TABLE_SEMANTICS_PROMPT,
+])
+def test_estimated_text_is_what_the_template_sends(prompt):
+    inputs = {name: value for name, value in INPUTS.items() if name in prompt.template.input_variables}
+    messages = prompt.template.format_messages(**inputs)
+    assert prompt.text(**inputs) == "\n".join(message.content for message in messages)
+
+
+def test_dry_run_does_not_import_the_prompt_templates(tmp_path):
+    code = (
+        "import sys\n"
+        "from graph_builder import DBToGraph\n"
+        "from schemas.mondial_schema import MONDIAL_SCHEMA\n"
+        f"DBToGraph(MONDIAL_SCHEMA, cache_dir={str(tmp_path)!r}).build_plan()\n"
+        "assert 'langchain_core.prompts.chat' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True)
@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from pipeline import rate_limiter
+from pipeline.rate_limiter import RequestScheduler, TokenBucket, retry_after
+
+
+class Clock:
+    # time.monotonic and the sleeps, without waiting: sleeping moves the clock.
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def asleep(self, seconds):
+        self.sleep(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, "sleep", clock.sleep)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", clock.asleep)
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def rate_limit_error(retry_after_seconds=None):
+    headers = {"retry-after": str(retry_after_seconds)} if retry_after_seconds is not None else {}
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.RateLimitError("Rate limit reached", response=httpx.Response(429, headers=headers, request=request),
+                                 body=None)
+
+
+def failing(times, error=None):
+    calls = []
+
+    def function():
+        calls.append(None)
+        if len(calls) <= times:
+            raise error or rate_limit_error()
+        return "answer"
+
+    return function, calls
+
+
+def test_bucket_goes_into_debt_and_refills(clock):
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60) == 0.0
+    # One per second: the next caller waits a second, the one after it two.
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(1) == pytest.approx(2.0)
+    clock.now += 30
+    assert bucket.reserve(1) == 0.0
+    # More than the capacity is capped to it, a huge call waits a minute at most.
+    clock.now += 60
+    assert bucket.reserve(10**6) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_the_slowest_bucket_sets_the_wait(clock):
+    scheduler = RequestScheduler(requests_per_minute=600, tokens_per_minute=6000)
+    assert scheduler.reserve(6000) == 0.0
+    # Requests have room, the 6000 tokens in debt take a minute to refill.
+    assert scheduler.reserve(6000) == pytest.approx(60.0)
+
+
+def test_retry_after_header():
+    assert retry_after(rate_limit_error(7)) == 7.0
+    assert retry_after(rate_limit_error()) == 0.0
+    assert retry_after(TimeoutError()) == 0.0
+
+
+def test_rate_limits_are_retried_with_backoff(clock):
+    scheduler = RequestScheduler(10**6, 10**9, base_delay=1.0, max_delay=5.0)
+    function, calls = failing(4)
+    retries = []
+    assert scheduler.call(function, 100, on_retry=retries.append) == "answer"
+    assert len(calls) == 5 and len(retries) == 4
+    # Exponential, capped at max_delay.
+    assert [delay for delay in clock.sleeps if delay] == [1.0, 2.0, 4.0, 5.0]
+
+
+def test_retry_after_beats_a_shorter_backoff(clock):
+    scheduler = RequestScheduler(10**6, 10**9, base_delay=1.0)
+    function, _ = failing(1, rate_limit_error(30))
+    scheduler.call(function, 100)
+    assert [delay for delay in clock.sleeps if delay] == [30.0]
+
+
+def test_retries_give_up_after_max_retries(clock):
+    scheduler = RequestScheduler(10**6, 10**9, max_retries=2)
+    function, calls = failing(10)
+    with pytest.raises(openai.RateLimitError):
+        scheduler.call(function, 100)
+    assert len(calls) == 3
+
+
+def test_other_errors_are_not_retried(clock):
+    scheduler = RequestScheduler(10**6, 10**9)
+    function, calls = failing(1, ValueError("bad prompt"))
+    with pytest.raises(ValueError):
+        scheduler.call(function, 100)
+    assert len(calls) == 1
+
+
+def test_async_calls_retry_the_same_way(clock):
+    scheduler = RequestScheduler(10**6, 10**9, max_retries=3, base_delay=1.0)
+    function, calls = failing(2)
+
+    async def call():
+        return function()
+
+    assert asyncio.run(scheduler.acall(call, 100)) == "answer"
+    assert len(calls) == 3
+    assert [delay for delay in clock.sleeps if delay] == [1.0, 2.0]
+
+    function, calls = failing(10)
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(scheduler.acall(call, 100))
+    assert len(calls) == 4
@@ -0,0 +1,55 @@
+import sys
+
+from pipeline.ddl_parser import parse_schema
+from pipeline.schema_context import SchemaContextIndex, name_variants
+
+SALES_SCHEMA = """
+CREATE TABLE sales.customers (id INT PRIMARY KEY, name VARCHAR(50));
+CREATE TABLE sales.orders (id INT PRIMARY KEY, customer_id INT, FOREIGN KEY (customer_id) REFERENCES sales.customers(id));
+CREATE TABLE billing.customers (id INT PRIMARY KEY);
+CREATE TABLE billing.invoices (id INT PRIMARY KEY, customer INT REFERENCES customers(id));
+"""
+
+
+def index():
+    tables = parse_schema(SALES_SCHEMA)
+    return SchemaContextIndex(tables), {table.name: table for table in tables}
+
+
+def test_name_variants():
+    assert "country" in name_variants("Country_ID")
+    assert "country" in name_variants("countries")
+    assert "customer" in name_variants("sales.customers")
+
+
+def test_schema_qualified_foreign_keys_give_context():
+    schema_context, tables = index()
+    candidates = schema_context.candidate_tables(tables["sales.orders"])
+    assert candidates[0].name == "sales.customers"
+    assert "sales.customers (id INT PRIMARY KEY" in schema_context.context(tables["sales.orders"]).splitlines()[0]
+
+
+def test_unqualified_references_resolve_in_the_same_schema():
+    schema_context, tables = index()
+    assert schema_context.candidate_tables(tables["billing.invoices"])[0].name == "billing.customers"
+
+
+class CharacterTokenizer:
+    # A tiktoken that gives one token per character.
+    @staticmethod
+    def encoding_for_model(model_name):
+        return CharacterTokenizer()
+
+    def encode(self, text):
+        return list(text)
+
+
+def test_context_budget_does_not_depend_on_the_installed_tokenizer(monkeypatch):
+    # The context is part of the cache keys, a tokenizer that counts differently must not change it.
+    monkeypatch.setitem(sys.modules, "tiktoken", CharacterTokenizer)
+    schema_context, tables = index()
+    schema_context.max_tokens = 20
+    # 70 characters, 18 tokens at 4 characters per token: the full DDL fits.
+    assert schema_context.context(tables["sales.orders"]) == (
+        "CREATE TABLE  sales.customers (id INT PRIMARY KEY, name VARCHAR(50));"
+    )
@@ -0,0 +1,64 @@
+import asyncio
+import io
+
+import pytest
+
+from pipeline.augmentation_cache import split_schema_tables
+from pipeline.streaming import iter_schema_tables, iter_tables, run_pipeline
+from schemas.mondial_schema import MONDIAL_SCHEMA
+
+
+def pieces(text, size):
+    return (text[index:index + size] for index in range(0, len(text), size))
+
+
+def test_tables_split_the_same_whatever_the_read_size():
+    # CREATE TABLE markers cut between two pieces at every position.
+    expected = split_schema_tables(MONDIAL_SCHEMA)
+    for size in range(1, 1001):
+        assert list(iter_schema_tables(pieces(MONDIAL_SCHEMA, size))) == expected, size
+
+
+def test_files_and_parsed_tables():
+    tables = list(iter_tables(io.StringIO(MONDIAL_SCHEMA)))
+    assert len(tables) == 33
+    assert list(iter_tables(tables)) == tables
+
+
+def test_pipeline_keeps_every_item():
+    results = []
+
+    async def double(item):
+        await asyncio.sleep(0)
+        return item * 2
+
+    async def collect(item):
+        results.append(item)
+
+    asyncio.run(run_pipeline(range(100), [(double, 4), (collect, 1)], queue_size=2))
+    assert sorted(results) == [item * 2 for item in range(100)]
+
+
+def test_pipeline_raises_the_first_error_and_cancels_the_other_stages():
+    started, cancelled = [], []
+
+    async def fail_on_one(item):
+        if item == 1:
+            raise ValueError("table 1")
+        return item
+
+    async def slow_write(item):
+        started.append(item)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+
+    async def run():
+        await asyncio.wait_for(run_pipeline(range(100), [(fail_on_one, 2), (slow_write, 1)], queue_size=2), 5)
+
+    with pytest.raises(ValueError, match="table 1"):
+        asyncio.run(run())
+    # The writer was stuck on its first item, it was cancelled instead of waited for.
+    assert started == cancelled == [0]
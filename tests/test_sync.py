@@ -0,0 +1,53 @@
+from benchmarks.fakes import CannedResponder, FakeChatModel, InMemoryGraphStore
+from graph_builder import DBToGraph
+from pipeline.ddl_parser import parse_schema
+from pipeline.rate_limiter import RequestScheduler
+
+SHOP_SCHEMA = """
+CREATE TABLE customers (id INT PRIMARY KEY, name VARCHAR(50));
+CREATE TABLE orders (id INT PRIMARY KEY, customer_id INT REFERENCES customers(id), total FLOAT);
+CREATE TABLE suppliers (id INT PRIMARY KEY, name VARCHAR(50));
+"""
+# orders loses its total column, suppliers is dropped and products is added.
+CHANGED_SHOP_SCHEMA = """
+CREATE TABLE customers (id INT PRIMARY KEY, name VARCHAR(50));
+CREATE TABLE orders (id INT PRIMARY KEY, customer_id INT REFERENCES customers(id));
+CREATE TABLE products (id INT PRIMARY KEY, price FLOAT);
+"""
+
+
+def db_to_graph(schema, tmp_path, store):
+    llm = FakeChatModel(responder=CannedResponder(parse_schema(schema)))
+    return DBToGraph(
+        schema, cache_dir=str(tmp_path), llm=llm, writer=store, scheduler=RequestScheduler(10**9, 10**12),
+    ), llm
+
+
+def test_sync_replaces_changed_tables_and_deletes_removed_ones(tmp_path):
+    store = InMemoryGraphStore()
+    first, _ = db_to_graph(SHOP_SCHEMA, tmp_path, store)
+    first.create_kg()
+    assert ("Column", "Orders.Total") in store.nodes
+    assert ("Table", "Suppliers") in store.nodes
+    customers = {key: value for key, value in store.nodes.items() if key[1].startswith("Customers")}
+
+    second, llm = db_to_graph(CHANGED_SHOP_SCHEMA, tmp_path, store)
+    schema_diff = second.sync_kg()
+
+    assert (schema_diff.added, list(schema_diff.changed), schema_diff.removed) == (["products"], ["orders"], ["suppliers"])
+    # Only the added and changed tables go through the LLM.
+    assert llm.counters["augmentation"]["calls"] == llm.counters["extraction"]["calls"] == 2
+    assert ("Column", "Orders.Total") not in store.nodes
+    assert not [key for key in store.relationships if "Orders.Total" in (key[1], key[4])]
+    assert not [key for key in store.nodes if key[1].startswith("Suppliers")]
+    assert not [key for key in store.relationships if key[1].startswith("Suppliers") or key[4].startswith("Suppliers")]
+    assert ("Column", "Products.Price") in store.nodes
+    assert ("Column", "Orders.Customer_Id", "FOREIGN_KEY_OF", "Column", "Customers.Id") in store.relationships
+    assert {key: value for key, value in store.nodes.items() if key[1].startswith("Customers")} == customers
+    assert sorted(second.manifest.tables) == ["customers", "orders", "products"]
+
+    # Nothing changed since, a second sync calls nothing and writes nothing.
+    third, llm = db_to_graph(CHANGED_SHOP_SCHEMA, tmp_path, store)
+    nodes = dict(store.nodes)
+    assert third.sync_kg().summary() == "0 added, 0 changed, 0 removed, 3 unchanged tables"
+    assert not llm.counters and store.nodes == nodes
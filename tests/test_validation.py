@@ -0,0 +1,48 @@
+from collections import Counter
+
+from benchmarks.fakes import CannedResponder, FakeChatModel, InMemoryGraphStore
+from graph_builder import DBToGraph
+from pipeline.ddl_parser import parse_schema
+from pipeline.rate_limiter import RequestScheduler
+from pipeline.structural_graph import table_to_graph_document
+from pipeline.validation import validate_graph_document
+from schemas.mondial_schema import MONDIAL_SCHEMA
+
+
+def build(tmp_path, responder, **kwargs):
+    store = InMemoryGraphStore()
+    db_to_graph = DBToGraph(
+        MONDIAL_SCHEMA, cache_dir=str(tmp_path), llm=FakeChatModel(responder=responder), writer=store,
+        scheduler=RequestScheduler(10**9, 10**12), **kwargs,
+    )
+    db_to_graph.create_kg()
+    return db_to_graph, store
+
+
+def test_repaired_table_keeps_the_extracted_labels_and_ids(tmp_path):
+    canned = CannedResponder(parse_schema(MONDIAL_SCHEMA))
+
+    def responder(prompt, tool_name=None):
+        answer = canned(prompt, tool_name)
+        if tool_name and "The table city " in prompt.split("### Input Chunk")[-1]:
+            answer["nodes"] = [node for node in answer["nodes"] if node["id"] != "city.Population"]
+        return answer
+
+    db_to_graph, store = build(tmp_path, responder)
+
+    assert db_to_graph.quality_report.tables["city"]["issues"][0]["node_id"] == "city.Population"
+    assert not db_to_graph.quality_report.tables["city"]["remaining"]
+    assert Counter(node_type for node_type, _ in store.nodes) == Counter({"Column": 137, "Table": 33})
+    assert ("Column", "City.Population") in store.nodes
+    assert ("Table", "City") in store.nodes
+    assert ("Column", "City.Population") in {tuple(node) for node in db_to_graph.manifest.tables["city"]["nodes"]}
+
+
+def test_validation_reports_missing_columns_and_wrong_types():
+    tables_by_name = CannedResponder(parse_schema(MONDIAL_SCHEMA)).tables_by_name
+    graph_document = table_to_graph_document(tables_by_name["continent"], tables_by_name)
+    graph_document.nodes = [node for node in graph_document.nodes if node.id != "continent.Area"]
+    graph_document.nodes[1].properties["data_type"] = "TEXT"
+
+    issues = validate_graph_document(tables_by_name["continent"], tables_by_name, graph_document)
+    assert sorted(issue.kind for issue in issues) == ["missing_column", "wrong_type"]